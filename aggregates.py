@@ -0,0 +1,140 @@
+# aggregates.py - Накопительные агрегаты по записям дневника
+from collections import Counter, OrderedDict
+
+from timeseries import EmotionTimeline
+
+
+def _entry_values(entry):
+    """Поля записи-словаря (дневник и анализатор хранят записи одинаково)"""
+    return (entry.get('timestamp', ''), entry.get('emotion', ''), entry.get('intensity', 0),
+            entry.get('triggers', []), entry.get('physical_sensations', []), entry.get('thoughts', []))
+
+
+class DiaryAggregates:
+    """Все агрегаты дневника за один проход по записям: их делят отчёт, графики и сводки"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        self.emotion_by_date = {}  # дата -> {эмоция: сумма интенсивностей}
+        # Колонки записей с датой и эмоцией — для рядов на numpy (timeline())
+        self.days = []
+        self.emotions = []
+        self.intensities = []
+        self._timeline = None
+        self.emotion_counts = Counter()
+        self.trigger_counts = Counter()
+        self.sensation_counts = Counter()
+        self.thought_counts = Counter()
+
+    def add(self, entry):
+        """Учитывает одну запись"""
+        timestamp, emotion, intensity, triggers, sensations, thoughts = _entry_values(entry)
+        self.total += 1
+
+        date = timestamp.split(' ')[0]
+        daily = self.emotion_by_date.setdefault(date, {})
+        daily[emotion] = daily.get(emotion, 0) + intensity
+
+        if date and emotion:
+            self.days.append(date)
+            self.emotions.append(emotion)
+            self.intensities.append(intensity or 0)
+            self._timeline = None
+
+        self.emotion_counts[emotion] += 1
+        # Циклы вместо Counter.update: тот проверяет тип аргумента на каждый вызов
+        for counts, items in ((self.trigger_counts, triggers), (self.sensation_counts, sensations),
+                              (self.thought_counts, thoughts)):
+            for item in items or ():
+                counts[item] = counts.get(item, 0) + 1
+        return thoughts
+
+    def extend(self, entries):
+        for entry in entries:
+            self.add(entry)
+
+    def rebuild(self, entries):
+        """Пересчитывает всё с нуля (после замены списка записей)"""
+        self.reset()
+        self.extend(entries)
+
+    def timeline(self):
+        """Ряды день × эмоция (timeseries.EmotionTimeline); строятся один раз на набор данных"""
+        if self._timeline is None:
+            self._timeline = EmotionTimeline(self.days, self.emotions, self.intensities)
+        return self._timeline
+
+    def emotion_trend(self):
+        return {d: dict(em) for d, em in self.emotion_by_date.items()}
+
+
+def summarize(entries):
+    aggregates = DiaryAggregates()
+    aggregates.extend(entries)
+    return aggregates
+
+
+class AggregationEngine:
+    """Агрегаты по состоянию (версия данных, фильтр): один проход по записям на состояние.
+
+    Все графики дневника берут результат отсюда, поэтому обновление проходит по записям
+    один раз, а возврат к уже применённому фильтру не требует прохода вовсе.
+    """
+
+    def __init__(self, cache_size=16):
+        self.cache_size = cache_size
+        self.passes = 0
+        self._cache = OrderedDict()
+
+    def get(self, state, entries):
+        """entries — список записей или функция, которая его вернёт (вызывается только при промахе)"""
+        aggregates = self._cache.get(state)
+        if aggregates is None:
+            aggregates = summarize(entries() if callable(entries) else entries)
+            self.passes += 1
+            self._cache[state] = aggregates
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(state)
+        return aggregates
+
+    def advance(self, state, new_state, entries):
+        """Переносит агрегаты state в new_state, дописав к ним entries (новые записи).
+
+        Добавление записи не требует прохода по всему дневнику; если агрегатов state в кэше нет,
+        new_state посчитается при первом get.
+        """
+        aggregates = self._cache.pop(state, None)
+        if aggregates is not None:
+            aggregates.extend(entries)
+            self._cache[new_state] = aggregates
+
+    def clear(self):
+        self._cache.clear()
+
+
+class ReportAggregator(DiaryAggregates):
+    """Поддерживает агрегаты для долгосрочного отчёта, обновляя их за O(1) на каждую новую запись.
+
+    count_risks — функция, принимающая список мыслей одной записи и возвращающая
+    Counter {фактор риска: число мыслей с этим фактором}.
+    """
+
+    def __init__(self, count_risks):
+        self.count_risks = count_risks
+        super().__init__()
+
+    def reset(self):
+        super().reset()
+        self.risk_hits = Counter()
+
+    def add(self, entry):
+        """Учитывает одну запись"""
+        thoughts = super().add(entry)
+        if thoughts:
+            self.risk_hits.update(self.count_risks(thoughts))
+        return thoughts
@@ -1,28 +1,58 @@
 # 2. analyzer.py - Логика анализа
-import fasttext
 from collections import Counter, defaultdict
 from data_models import JournalEntry, ImmediateAnalysis, LongTermAnalysis
+from recommendations import RecommendationStore
+from aggregates import ReportAggregator
+from risk_patterns import RiskPatternMatcher, DEFAULT_NEGATIVE_PATTERNS
+from model_loader import ModelLoader
+from prediction_cache import PredictionCache, normalize_text
 import json
+import threading
 from datetime import datetime
 
+
+def _as_record(entry):
+    """Записи анализатора — словари, как в хранилище и дневнике; JournalEntry приводится к ним"""
+    return entry if isinstance(entry, dict) else entry.model_dump()
+
+
 class EmotionAnalyzer:
-    def __init__(self):
+    def __init__(self, model_path="model/emotion_model.bin", model_loader=None, risk_matcher=None,
+                 recommendations=None, prediction_cache=None):
+        """model_loader, risk_matcher, recommendations, prediction_cache — общие объекты другого
+        анализатора (users.UserSessions): модель и справочники не загружаются на каждого пользователя"""
+        self._lock = threading.RLock()
+        # Таблицу паттернов можно расширять через data/risk_patterns.json
+        self.risk_matcher = risk_matcher or RiskPatternMatcher.from_file("data/risk_patterns.json", DEFAULT_NEGATIVE_PATTERNS)
+        self._aggregates = ReportAggregator(self._count_risk_hits)
         self.entries = []
-        self.model = None
+        self.recommendations = recommendations or RecommendationStore("data/recommendations.json")
+        # Повторные тексты (импорт, шаблонные записи) не гоняются через модель заново
+        self.prediction_cache = prediction_cache if prediction_cache is not None else PredictionCache()
 
         # Проверка существования методов
         if not hasattr(self, '_generate_recommendations'):
             print("⚠️ ВНИМАНИЕ: Метод _generate_recommendations не найден!")
 
-        try:
-            # ЗАГРУЖАЕМ FastText-МОДЕЛЬ
-            self.model = fasttext.load_model("model/emotion_model.bin")
-        except Exception as e:
-            print(f"[ОШИБКА] Не удалось загрузить модель: {str(e)}")
-            print("Убедитесь, что файл model/emotion_model.bin существует")
+        # Модель грузится в фоне, окно приложения не ждёт её загрузки
+        self.model_loader = model_loader or ModelLoader(model_path)
+        self.model_loader.start()
+
+    @property
+    def model(self):
+        """FastText-модель; при первом обращении ждёт окончания фоновой загрузки"""
+        return self.model_loader.get()
+
+    @model.setter
+    def model(self, model):
+        self.model_loader = ModelLoader.from_model(model)
+
+    def analyze_entry(self, entry_data, record=True):
+        """Анализирует новую запись и возвращает ImmediateAnalysis.
 
-    def analyze_entry(self, entry_data):
-        """Анализирует новую запись и возвращает ImmediateAnalysis"""
+        record=False — запись не попадает в историю: вызывающий сам соберёт итоговый словарь
+        и передаст его в record_entry, чтобы история и дневник держали один и тот же объект.
+        """
         try:
             entry = JournalEntry(**entry_data)
         except Exception as e:
@@ -39,7 +69,7 @@ class EmotionAnalyzer:
             )
 
         try:
-            labels, probs = self.model.predict(entry.text)
+            (labels, probs), = self._predict([entry.text])
             entry.emotion = labels[0].replace("__label__", "")
             entry.intensity = int(probs[0] * 10)
         except Exception as e:
@@ -53,53 +83,179 @@ class EmotionAnalyzer:
             recommendation=self._generate_recommendations(entry)
         )
 
-        self.entries.append(entry)
+        if record:
+            self.record_entry(entry.model_dump())
         return analysis
 
-    def generate_long_term_report(self):
+    def record_entry(self, entry):
+        """Добавляет проанализированную запись-словарь в историю без копирования"""
+        # Запись может прийти из фонового потока, пока главный поток строит отчёт
+        with self._lock:
+            self.entries.append(entry)
+            self._aggregates.add(entry)
+            self._index_entries([entry])
+
+    def analyze_entries(self, entries_data, k=1, threshold=0.0, record=True):
+        """Пакетный анализ записей (импорт истории): все тексты уходят в FastText одним вызовом predict.
+
+        Возвращает список ImmediateAnalysis в том же порядке, что и входные данные;
+        для записей, не прошедших валидацию, на их месте стоит None.
+        record=False — только анализ, записи не попадают в историю и отчёт (сервер).
+        """
+        # Сначала валидируем всё, чтобы не гонять модель ради заведомо битых записей
+        entries = []
+        for entry_data in entries_data:
+            try:
+                entries.append(JournalEntry(**entry_data))
+            except Exception as e:
+                print(f"Ошибка создания записи: {e}")
+                entries.append(None)
+
+        valid = [entry for entry in entries if entry is not None]
+        if not valid:
+            return [None] * len(entries)
+
+        if not self.model:
+            for entry in valid:
+                entry.emotion = "неизвестно"
+                entry.intensity = 0
+            return [self._build_analysis(entry) if entry is not None else None for entry in entries]
+
+        try:
+            predictions = self._predict([entry.text for entry in valid], k=k, threshold=threshold)
+        except Exception as e:
+            print(f"Ошибка предсказания эмоций: {e}")
+            return [None] * len(entries)
+
+        analyses = []
+        for entry, (entry_labels, entry_probs) in zip(valid, predictions):
+            probabilities = {
+                label.replace("__label__", ""): float(prob)
+                for label, prob in zip(entry_labels, entry_probs)
+            }
+            if probabilities:
+                entry.emotion = entry_labels[0].replace("__label__", "")
+                entry.intensity = int(entry_probs[0] * 10)
+            else:
+                # Ни одна метка не прошла порог
+                entry.emotion = "неизвестно"
+                entry.intensity = 0
+            analyses.append(self._build_analysis(entry, probabilities))
+
+        if record:
+            records = [entry.model_dump() for entry in valid]
+            with self._lock:
+                self.entries.extend(records)
+                self._aggregates.extend(records)
+                self._index_entries(records)
+
+        analyses = iter(analyses)
+        return [next(analyses) if entry is not None else None for entry in entries]
+
+    def _predict(self, texts, k=1, threshold=0.0):
+        """Предсказания через кэш: (метки, вероятности) на каждый текст"""
+        model = self.model
+        # Кэш привязан к загруженной модели и очищается, если она сменилась
+        self.prediction_cache.bind(self.model_loader.fingerprint)
+        return self.prediction_cache.predict(model, [normalize_text(text) for text in texts], k, threshold)
+
+    def _build_analysis(self, entry, probabilities=None):
+        return ImmediateAnalysis(
+            manifested_emotion=entry.emotion,
+            intensity=entry.intensity,
+            recommendation=self._generate_recommendations(entry),
+            emotion_probabilities=probabilities or {}
+        )
+
+    @property
+    def entries(self):
+        return self._entries
+
+    @entries.setter
+    def entries(self, entries):
+        # Замена всего списка (загрузка дневника) — агрегаты пересчитываются один раз.
+        # Записи хранятся словарями: потребителям не нужно различать типы
+        entries = [_as_record(entry) for entry in entries]
+        with self._lock:
+            self._entries = entries
+            self._aggregates.rebuild(entries)
+            self._by_id = {}
+            self._index_entries(entries)
+
+    def _index_entries(self, entries):
+        for entry in entries:
+            if entry.get('id') is not None:
+                self._by_id[entry['id']] = entry
+
+    def get_entry(self, entry_id):
+        """Запись по её id (тому же, что в хранилище и в таблице дневника)"""
+        return self._by_id.get(entry_id)
+
+    def load_entries(self, source):
+        """Загружает записи из хранилища (repository.JournalRepository) от старых к новым.
+
+        Записи остаются словарями хранилища, без копий в JournalEntry: те же словари
+        может показывать и дневник (main_app), записи в памяти не дублируются.
+        """
+        self.entries = [entry for entry in source.iter_entries() if isinstance(entry, dict)]
+
+    def _sync_aggregates(self):
+        """Догоняет агрегаты, если записи добавили в self.entries напрямую"""
+        known = self._aggregates.total
+        if known < len(self._entries):
+            self._aggregates.extend(self._entries[known:])
+        elif known > len(self._entries):
+            self._aggregates.rebuild(self._entries)
+
+    def generate_long_term_report(self, rebuild=False):
+        """Строит отчёт по накопленным агрегатам; rebuild=True — пересчёт всех записей с нуля"""
+        with self._lock:
+            return self._build_long_term_report(rebuild)
+
+    def _build_long_term_report(self, rebuild):
         if not self.entries:
             return None
 
-        total_entries = len(self.entries)
+        if rebuild:
+            aggregates = ReportAggregator(self._count_risk_hits)
+            aggregates.extend(self.entries)
+        else:
+            self._sync_aggregates()
+            aggregates = self._aggregates
 
-        # Динамика эмоций по дням
-        emotion_by_date = defaultdict(lambda: defaultdict(int))
-        for entry in self.entries:
-            date = entry.timestamp.split(' ')[0]
-            emotion = entry.emotion
-            intensity = entry.intensity
-            emotion_by_date[date][emotion] += intensity
+        total_entries = aggregates.total
 
-        # Преобразуем defaultdict в обычный dict
-        emotion_trend = {d: dict(em) for d, em in emotion_by_date.items()}
+        # Динамика эмоций по дням
+        emotion_trend = aggregates.emotion_trend()
 
         # Анализ эмоций
-        emotion_counts = Counter(e.emotion for e in self.entries if hasattr(e, 'emotion'))
+        emotion_counts = aggregates.emotion_counts
         most_common_emotion, count = emotion_counts.most_common(1)[0]
         emotion_percent = int(count / total_entries * 100)
 
         # Анализ триггеров
-        all_triggers = [t for e in self.entries for t in getattr(e, 'triggers', [])]
-        trending_triggers = [t[0] for t in Counter(all_triggers).most_common(3)] if all_triggers else ["Нет данных"]
+        trigger_counts = aggregates.trigger_counts
+        trending_triggers = [t[0] for t in trigger_counts.most_common(3)] if trigger_counts else ["Нет данных"]
 
         # Физические симптомы
-        all_sensations = [s for e in self.entries for s in getattr(e, 'physical_sensations', [])]
-        common_sensations = [s[0] for s in Counter(all_sensations).most_common(2)] if all_sensations else ["Нет данных"]
+        sensation_counts = aggregates.sensation_counts
+        common_sensations = [s[0] for s in sensation_counts.most_common(2)] if sensation_counts else ["Нет данных"]
 
-        # Мысли
-        all_thoughts = [t for e in self.entries for t in getattr(e, 'thoughts', [])]
         # Осознанные (частые) мысли
-        common_thoughts = [t[0] for t in Counter(all_thoughts).most_common(5)]
+        common_thoughts = [t[0] for t in aggregates.thought_counts.most_common(5)]
 
-        # Факторы риска (исправленный вызов)
-        risk_factors = self._identify_risk_factors(all_thoughts)
+        # Факторы риска по накопленным совпадениям
+        if aggregates.thought_counts:
+            risk_factors = self._identify_risk_factors(hits=aggregates.risk_hits)
+        else:
+            risk_factors = self._identify_risk_factors([])
 
         return LongTermAnalysis(
             most_common_emotion=f"{most_common_emotion} ({emotion_percent}% записей)",
             trending_triggers=trending_triggers,
             physiological_pattern=f"Чаще всего: {', '.join(common_sensations)}",
             cognitive_pattern=f"Частые мысли: {', '.join(f'«{t}»' for t in common_thoughts)}",
-            psychological_state=self._assess_mental_state(),
+            psychological_state=self._assess_mental_state(emotion_counts, total_entries),
             risk_factors=risk_factors,
             recommendation=self._long_term_recommendations(most_common_emotion),
             emotion_trend=emotion_trend,  # 👈 Новое
@@ -107,30 +263,11 @@ class EmotionAnalyzer:
         )
 
     def _generate_recommendations(self, entry):
-        # Загружаем рекомендации из JSON
-        print(f"▶ _generate_recommendations вызван. Entry: {entry}")
-        default_rec = {
-            "short_term": ["Рекомендации не найдены"],
-            "scientific_references": [],
-            "about": {
-                "description": "Описание недоступно",
-                "causes": []
-            }
-        }
-
-        try:
-            with open("data/recommendations.json", encoding="utf-8") as f:
-                raw = f.read().lstrip('\ufeff')  # удаляем BOM
-                recommendations = json.loads(raw)
-            result = recommendations.get(entry.emotion.lower(), default_rec)
-            print("✔ Рекомендации найдены:", result)
-            return result
-        except Exception as e:
-            print("Ошибка загрузки рекомендаций:", e)
-            return default_rec
+        # Рекомендации берутся из кэша в памяти, файл перечитывается только при изменении
+        return self.recommendations.get(entry.emotion)
 
     def _get_common_items(self, field):
-        all_items = [item for entry in self.entries for item in getattr(entry, field)]
+        all_items = [item for entry in self.entries for item in entry.get(field, [])]
         if not all_items:  # Если список пуст
             return ["Нет данных"]
         return [item[0] for item in Counter(all_items).most_common(3)]
@@ -146,43 +283,39 @@ class EmotionAnalyzer:
 
         # Если аргументы не переданы, вычисляем их
         if emotion_counts is None or total_entries is None:
-            emotion_counts = Counter(e.emotion for e in self.entries if hasattr(e, 'emotion'))
+            emotion_counts = Counter(e.get('emotion', '') for e in self.entries)
             total_entries = len(self.entries)
 
         # Упрощенная логика оценки
-        emotions = [e.emotion for e in self.entries if hasattr(e, 'emotion')]
-
-        if emotions.count('страх') / len(emotions) > 0.5:
+        if emotion_counts['страх'] / total_entries > 0.5:
             return "Возможное тревожное расстройство"
-        elif emotions.count('грусть') / len(emotions) > 0.5:
+        elif emotion_counts['грусть'] / total_entries > 0.5:
             return "Возможное депрессивное состояние"
-        elif emotions.count('гнев') / len(emotions) > 0.4:
+        elif emotion_counts['гнев'] / total_entries > 0.4:
             return "Повышенная раздражительность"
         else:
             return "Нормальное состояние"
 
-    def _identify_risk_factors(self, thoughts=None):
-        """Более надежная версия с проверкой ввода и возвратом словаря"""
-        if thoughts is None:
-            if not hasattr(self, 'entries'):
-                return {"": "Недостаточно данных"}
-            thoughts = [t for e in self.entries for t in getattr(e, 'thoughts', [])]
+    def _count_risk_hits(self, thoughts):
+        """Сколько мыслей попало под каждый фактор риска"""
+        return self.risk_matcher.count(thoughts)
 
-        if not thoughts:
-            return {"": "Не выявлены"}
+    def _identify_risk_factors(self, thoughts=None, hits=None):
+        """Более надежная версия с проверкой ввода и возвратом словаря"""
+        if hits is None:
+            if thoughts is None:
+                if not hasattr(self, 'entries'):
+                    return {"": "Недостаточно данных"}
+                thoughts = [t for e in self.entries for t in e.get('thoughts', [])]
 
-        results = {}
+            if not thoughts:
+                return {"": "Не выявлены"}
 
-        negative_patterns = {
-            'перфекционизм': ['должен быть идеальным', 'не могу ошибаться'],
-            'социальная тревожность': ['меня осудят', 'будут смеяться'],
-            'катастрофизация': ['все будет плохо', 'это катастрофа'],
-            'самокритика': ['я неудачник', 'я ничего не стою'],
-            'беспомощность': ['я не справлюсь', 'это бесполезно']
-        }
+            hits = self._count_risk_hits(thoughts)
 
-        for factor, patterns in negative_patterns.items():
-            if any(any(pattern in thought.lower() for pattern in patterns) for thought in thoughts):
+        results = {}
+        for factor in self.risk_matcher.factors:
+            if hits.get(factor):
                 results[factor] = f"Выражены мысли, связанные с паттерном '{factor}'."
 
         if not results:
@@ -0,0 +1,135 @@
+# backfill.py - Переразметка всей истории новой моделью: параллельно и с продолжением после сбоя
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from model_loader import model_version
+from prediction_cache import normalize_text
+from recommendations import RecommendationStore
+from repository import JournalRepository
+
+RECOMMENDATIONS_PATH = "data/recommendations.json"
+# С какого объёма истории переразметка идёт в пуле процессов (при jobs=None)
+PARALLEL_MIN_ENTRIES = 100000
+
+# Модель и рекомендации процесса-воркера: загружаются один раз в initializer, а не на каждую пачку
+_model = None
+_recommendations = None
+
+
+def _init_worker(model_path, recommendations_path=RECOMMENDATIONS_PATH):
+    global _model, _recommendations
+    import fasttext
+    _model = fasttext.load_model(model_path)
+    # Файл рекомендаций за время переразметки не перечитывается
+    _recommendations = RecommendationStore(recommendations_path, check_interval=float('inf'))
+
+
+def _predict_chunk(rows):
+    """[(id, текст)] -> [(id, эмоция, интенсивность, рекомендации JSON)]; всё — как в EmotionAnalyzer"""
+    labels, probs = _model.predict([normalize_text(text) for _, text in rows])
+    result = []
+    recommendations = {}  # эмоция -> JSON, сериализуется один раз на пачку
+    for (entry_id, _), entry_labels, entry_probs in zip(rows, labels, probs):
+        if len(entry_labels):
+            emotion, intensity = entry_labels[0].replace("__label__", ""), int(entry_probs[0] * 10)
+        else:
+            emotion, intensity = "неизвестно", 0
+        if emotion not in recommendations:
+            recommendations[emotion] = json.dumps(_recommendations.get(emotion), ensure_ascii=False)
+        result.append((entry_id, emotion, intensity, recommendations[emotion]))
+    return result
+
+
+def auto_jobs(total, cpus=None):
+    """Сколько процессов взять на total записей; 0 — переразметка в текущем процессе.
+
+    Пул окупается только при нескольких ядрах и большой истории: запуск процессов,
+    загрузка модели в каждом и передача текстов дороже, чем предсказание десятков
+    тысяч коротких записей в одном процессе.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    if cpus < 2 or total < PARALLEL_MIN_ENTRIES:
+        return 0
+    return cpus
+
+
+def backfill(journal, model_path, batch_size=4096, jobs=None, restart=False,
+             recommendations_path=RECOMMENDATIONS_PATH):
+    """Переразмечает записи моделью model_path; возвращает число переразмеченных записей.
+
+    Записи читаются пачками по id и расходятся по процессам (jobs=0 — в текущем процессе,
+    None — выбор по объёму истории и числу ядер, см. auto_jobs).
+    Результаты записываются строго по порядку пачек, поэтому контрольная точка — это
+    id последней записанной записи: прерванный запуск продолжится с неё. Записи, уже
+    размеченные этой моделью (в том числе сохранённые приложением), пропускаются;
+    restart=True переразмечает всё заново.
+    """
+    version = model_version(model_path)
+    if restart:
+        journal.reset_relabel(version)
+    skip_version = None if restart else version
+    start_id = journal.relabel_checkpoint(version)
+    total = journal.count_after(start_id, skip_version)
+    if start_id:
+        print(f"Продолжение с записи id={start_id}")
+    if jobs is None:
+        jobs = auto_jobs(total)
+    mode = f"процессов: {jobs}" if jobs else "в текущем процессе"
+    print(f"Модель {model_path} (версия {version}): к переразметке {total} записей, {mode}")
+
+    done = 0
+    started = time.perf_counter()
+
+    def write(labels):
+        nonlocal done
+        journal.apply_labels(labels, version)
+        done += len(labels)
+        elapsed = time.perf_counter() - started
+        print(f"  {done}/{total} записей, {done / elapsed:.0f} записей/с", end='\r')
+
+    if jobs == 0:
+        _init_worker(model_path, recommendations_path)
+        for rows in journal.iter_texts(start_id, batch_size, skip_version):
+            write(_predict_chunk(rows))
+    else:
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(model_path, recommendations_path)) as pool:
+            # Пачек в работе не больше 2 на процесс: память не зависит от размера истории
+            in_flight = deque()
+            for rows in journal.iter_texts(start_id, batch_size, skip_version):
+                in_flight.append(pool.submit(_predict_chunk, rows))
+                if len(in_flight) >= 2 * jobs:
+                    write(in_flight.popleft().result())
+            while in_flight:
+                write(in_flight.popleft().result())
+
+    print(f"\nГотово: {done} записей за {time.perf_counter() - started:.1f} с, версия модели {version}")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Переразметка сохранённых записей новой моделью")
+    parser.add_argument("--db", default="data/journal.db")
+    parser.add_argument("--model", default="model/emotion_model.bin")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--jobs", type=int, default=None, help="процессов (по умолчанию — по числу ядер, если история "
+                             f"не меньше {PARALLEL_MIN_ENTRIES} записей; 0 — без пула)")
+    parser.add_argument("--recommendations", default=RECOMMENDATIONS_PATH)
+    parser.add_argument("--restart", action="store_true",
+                        help="начать заново и переразметить все записи, даже уже размеченные этой моделью")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        raise SystemExit(f"Модель {args.model} не найдена")
+    journal = JournalRepository(args.db)
+    try:
+        backfill(journal, args.model, args.batch_size, args.jobs, args.restart, args.recommendations)
+    finally:
+        journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,843 @@
+# benchmark.py - Замеры производительности
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+
+def load_sample_texts(path="data/emotions.txt"):
+    """Тексты из обучающей выборки без меток — как материал для синтетических записей"""
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.lstrip('\ufeff').strip()
+            if not line:
+                continue
+            texts.append(" ".join(w for w in line.split() if not w.startswith("__label__")))
+    return texts or ["сегодня был обычный день"]
+
+
+def make_entries(count, seed=0, texts=None, offset=0):
+    """Генерирует count синтетических записей дневника (от старых к новым); offset — сдвиг по времени в записях"""
+    rnd = random.Random(seed)
+    texts = texts or load_sample_texts()
+    triggers = ["работа", "учёба", "семья", "деньги", "здоровье", "друзья", "дорога", "сон"]
+    sensations = ["напряжение", "усталость", "тяжесть в груди", "головная боль", "бессонница"]
+    thoughts = ["я не справлюсь", "все будет плохо", "меня осудят", "я неудачник",
+                "надо отдохнуть", "все получится", "это бесполезно", "не могу ошибаться"]
+    emotions = ["грусть", "тревога", "злость", "радость", "вина/стыд", "апатия/пустота"]
+
+    start = datetime(2020, 1, 1)
+    entries = []
+    for i in range(count):
+        moment = start + timedelta(minutes=37 * (offset + i))
+        entries.append({
+            'timestamp': moment.strftime('%Y-%m-%d %H:%M'),
+            'text': rnd.choice(texts),
+            'triggers': rnd.sample(triggers, rnd.randint(0, 2)),
+            'physical_sensations': rnd.sample(sensations, rnd.randint(0, 2)),
+            'thoughts': rnd.sample(thoughts, rnd.randint(0, 2)),
+            'emotion': rnd.choice(emotions),
+            'intensity': rnd.randint(1, 10)
+        })
+    return entries
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_batch(args):
+    """analyze_entry в цикле против analyze_entries одним вызовом"""
+    import fasttext
+    from analyzer import EmotionAnalyzer
+
+    model = fasttext.load_model(args.model)
+    entries = make_entries(args.count)
+    for entry in entries:
+        entry.pop('emotion')
+        entry.pop('intensity')
+
+    single = EmotionAnalyzer()
+    single.model = model
+    _, loop_time = _timed(lambda: [single.analyze_entry(e) for e in entries])
+
+    batch = EmotionAnalyzer()
+    batch.model = model
+    _, batch_time = _timed(batch.analyze_entries, entries)
+
+    print(f"Записей: {args.count}")
+    print(f"analyze_entry в цикле: {loop_time * 1000:.1f} мс")
+    print(f"analyze_entries:        {batch_time * 1000:.1f} мс (x{loop_time / batch_time:.1f})")
+
+
+def bench_report(args):
+    """Стоимость отчёта после каждой новой записи + сверка с пересчётом с нуля"""
+    from analyzer import EmotionAnalyzer
+
+    entries = make_entries(args.count)
+    analyzer = EmotionAnalyzer()
+    analyzer.entries = entries[:-args.appends]
+
+    incremental_time = 0.0
+    for entry in entries[-args.appends:]:
+        analyzer.entries.append(entry)
+        report, elapsed = _timed(analyzer.generate_long_term_report)
+        incremental_time += elapsed
+
+    rebuilt, rebuild_time = _timed(analyzer.generate_long_term_report, rebuild=True)
+    if report.model_dump() != rebuilt.model_dump():
+        raise SystemExit("ОШИБКА: накопительный отчёт расходится с пересчётом с нуля")
+
+    print(f"Записей: {args.count}, добавлений: {args.appends}")
+    print(f"Отчёт по агрегатам: {incremental_time / args.appends * 1000:.2f} мс на запись")
+    print(f"Пересчёт с нуля:    {rebuild_time * 1000:.2f} мс")
+    print("Отчёты совпадают")
+
+
+def bench_save(args):
+    """Задержка сохранения одной записи: вставка в SQLite против перезаписи всего JSON"""
+    import json
+    import os
+    import tempfile
+    from repository import JournalRepository
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            entries = make_entries(size + args.saves)
+            history, new_entries = entries[:size], entries[size:]
+
+            journal = JournalRepository(os.path.join(tmp, f"journal_{size}.db"))
+            journal.append_many(history)
+            start = time.perf_counter()
+            for entry in new_entries:
+                journal.append(entry)
+            append_ms = (time.perf_counter() - start) / args.saves * 1000
+            journal.close()
+
+            full_path = os.path.join(tmp, f"journal_{size}.json")
+            start = time.perf_counter()
+            for i in range(args.saves):
+                with open(full_path, 'w', encoding='utf-8') as f:
+                    json.dump(history + new_entries[:i + 1], f, ensure_ascii=False, indent=2)
+            dump_ms = (time.perf_counter() - start) / args.saves * 1000
+
+            print(f"{size:>8} записей: вставка {append_ms:7.2f} мс, полная перезапись {dump_ms:9.2f} мс")
+
+
+def _rss_mb():
+    """Текущая резидентная память процесса, МБ (psutil или /proc; None, если недоступно)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        import os
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def bench_charts(args):
+    """Память при многократном применении фильтра: постоянные графики против пересоздания через pyplot"""
+    import gc
+    import tracemalloc
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from charts import diary_charts
+
+    entries = make_entries(args.count)
+    emotions = sorted({e['emotion'] for e in entries})
+    rnd = random.Random(1)
+
+    def random_filter():
+        chosen = set(rnd.sample(emotions, rnd.randint(1, len(emotions))))
+        return [e for e in entries if e['emotion'] in chosen]
+
+    def report(label, samples):
+        first, last = samples[0], samples[-1]
+        rss = f", RSS {first[2]:.1f} -> {last[2]:.1f} МБ" if first[2] is not None else ""
+        print(f"{label}: Python-объекты {first[1]:.2f} -> {last[1]:.2f} МБ{rss}")
+
+    tracemalloc.start()
+
+    # Постоянные фигуры: меняются только данные линий и столбцов
+    charts = diary_charts()
+    for _, chart in charts:
+        chart.attach()
+        chart.update(entries)
+    samples = []
+    start = time.perf_counter()
+    for i in range(1, args.applies + 1):
+        filtered = random_filter()
+        for _, chart in charts:
+            chart.update(filtered)
+        if i == 1 or i % args.every == 0:
+            gc.collect()
+            samples.append((i, tracemalloc.get_traced_memory()[0] / 2 ** 20, _rss_mb()))
+    persistent_ms = (time.perf_counter() - start) / args.applies * 1000
+    for _, chart in charts:
+        chart.close()
+
+    print(f"Записей: {args.count}")
+    for i, traced, rss in samples:
+        print(f"  после {i:>5} применений: {traced:8.2f} МБ" + (f", RSS {rss:.1f} МБ" if rss is not None else ""))
+    report(f"Постоянные графики, {args.applies} применений ({persistent_ms:.1f} мс на применение)", samples)
+
+    # Прежний способ: новые фигуры pyplot на каждое применение, без закрытия
+    samples = []
+    plt.rcParams['figure.max_open_warning'] = 0
+    for i in range(1, args.legacy + 1):
+        filtered = random_filter()
+        for _ in range(4):
+            fig, ax = plt.subplots(figsize=(8, 4))
+            ax.plot([e['timestamp'][:10] for e in filtered[:50]], range(min(50, len(filtered))), marker='o')
+            fig.canvas.draw()
+        if i == 1 or i == args.legacy:
+            gc.collect()
+            samples.append((i, tracemalloc.get_traced_memory()[0] / 2 ** 20, _rss_mb()))
+    report(f"Пересоздание через pyplot, {args.legacy} применений (открытых фигур: {len(plt.get_fignums())})", samples)
+    plt.close('all')
+    tracemalloc.stop()
+
+
+def bench_chart_tabs(args):
+    """Задержка фильтра: каждый график считает сам, общие агрегаты на все графики
+    и ленивая отрисовка открытой вкладки с кэшем агрегатов"""
+    import matplotlib
+    matplotlib.use("Agg")
+    from charts import diary_charts
+    from aggregates import AggregationEngine, summarize
+
+    entries = make_entries(args.count)
+    emotions = sorted({e['emotion'] for e in entries})
+    rnd = random.Random(1)
+    # Несколько повторяющихся состояний фильтра: пользователь переключается между ними
+    states = [tuple(sorted(rnd.sample(emotions, rnd.randint(1, len(emotions))))) for _ in range(args.states)]
+    applies = [rnd.choice(states) for _ in range(args.applies)]
+
+    def filtered(state):
+        return [e for e in entries if e['emotion'] in state]
+
+    charts = diary_charts()
+    for _, chart in charts:
+        chart.attach()
+
+    start = time.perf_counter()
+    for state in applies:
+        subset = filtered(state)
+        for _, chart in charts:
+            chart.update(subset)
+    eager_ms = (time.perf_counter() - start) / args.applies * 1000
+
+    start = time.perf_counter()
+    for state in applies:
+        aggregates = summarize(filtered(state))
+        for _, chart in charts:
+            chart.render(aggregates)
+    shared_ms = (time.perf_counter() - start) / args.applies * 1000
+
+    engine = AggregationEngine()
+    start = time.perf_counter()
+    for state in applies:
+        subset = filtered(state)
+        for _, chart in charts:
+            chart.dirty = True
+        # Открыта одна вкладка — рисуется только она, агрегаты берутся из кэша по состоянию фильтра
+        charts[0][1].render(engine.get((0, state), subset))
+    lazy_ms = (time.perf_counter() - start) / args.applies * 1000
+
+    for _, chart in charts:
+        chart.close()
+
+    print(f"Записей: {args.count}, применений фильтра: {args.applies}, разных фильтров: {args.states}")
+    print(f"Все четыре графика:         {eager_ms:8.1f} мс на применение (проход по записям на каждый)")
+    print(f"Общие агрегаты:             {shared_ms:8.1f} мс на применение ({eager_ms / shared_ms:.1f}x)")
+    print(f"Только открытая вкладка:    {lazy_ms:8.1f} мс на применение ({eager_ms / lazy_ms:.1f}x, "
+          f"проходов по записям: {engine.passes})")
+
+
+def _linear_filter(entries, emotion=None, trigger=None, date_from=None, date_to=None,
+                   search_text='', search_in=None):
+    """Прежний DiaryView._apply_filters: копия списка и проход с strptime на каждый фильтр дат;
+    текст проверяется в каждой записи"""
+    filtered = entries.copy()
+    if emotion:
+        filtered = [e for e in filtered if e.get('emotion') == emotion]
+    if trigger:
+        filtered = [e for e in filtered if trigger in e.get('triggers', [])]
+    if date_from:
+        filtered = [e for e in filtered if datetime.strptime(e['timestamp'], '%Y-%m-%d %H:%M').date() >= date_from]
+    if date_to:
+        filtered = [e for e in filtered if datetime.strptime(e['timestamp'], '%Y-%m-%d %H:%M').date() <= date_to]
+    if search_text:
+        # Те же правила поиска по словам, но проверкой каждой записи
+        from search_index import entry_matches
+        filtered = [e for e in filtered if entry_matches(e, search_text, search_in)]
+    return sorted(filtered, key=lambda e: e.get('timestamp', ''), reverse=True)
+
+
+def bench_filter(args):
+    """Фильтры дневника: колоночный индекс против линейного прохода + сверка результатов"""
+    from diary_index import DiaryIndex
+
+    entries = make_entries(args.count)
+    for i, entry in enumerate(entries):
+        entry['id'] = i + 1
+
+    index, build_time = _timed(DiaryIndex, entries)
+    first = datetime.strptime(entries[0]['timestamp'][:10], '%Y-%m-%d').date()
+    last = datetime.strptime(entries[-1]['timestamp'][:10], '%Y-%m-%d').date()
+    middle = first + (last - first) / 2
+
+    cases = [
+        ("без фильтров", {}),
+        ("эмоция", {'emotion': 'тревога'}),
+        ("триггер", {'trigger': 'работа'}),
+        ("даты", {'date_from': middle, 'date_to': middle + timedelta(days=30)}),
+        ("эмоция + даты", {'emotion': 'грусть', 'date_from': middle}),
+        ("эмоция + триггер + даты", {'emotion': 'грусть', 'trigger': 'семья', 'date_to': middle}),
+        ("поиск в мыслях", {'search_text': 'справлюсь', 'search_in': "Мыслях"}),
+        ("поиск по префиксу", {'search_text': 'неуд', 'search_in': "Всем тексте"}),
+        ("поиск двух слов", {'search_text': 'все будет', 'search_in': "Всем тексте"}),
+        ("эмоция + поиск", {'emotion': 'злость', 'search_text': 'я', 'search_in': "Всем тексте"}),
+    ]
+
+    print(f"Записей: {args.count}, построение индекса: {build_time * 1000:.0f} мс")
+    for name, filters in cases:
+        keys, index_time = _timed(index.query, **filters)
+        for _ in range(args.repeat - 1):
+            index_time += _timed(index.query, **filters)[1]
+        expected, linear_time = _timed(_linear_filter, entries, **filters)
+        if keys != [e['id'] for e in expected]:
+            raise SystemExit(f"ОШИБКА: индекс расходится с линейным фильтром ({name})")
+        print(f"  {name:<26} {len(keys):>7} записей: индекс {index_time / args.repeat * 1000:7.2f} мс, "
+              f"линейно {linear_time * 1000:8.1f} мс")
+    print("Результаты совпадают")
+
+
+def _legacy_daily_series(entries):
+    """Прежние _plot_emotion_chart/_plot_intensity_chart: вложенные словари списков
+    и заполнение матрицы дата × эмоция вложенными циклами"""
+    emotion_by_day = defaultdict(lambda: defaultdict(int))
+    intensity_by_day = defaultdict(lambda: defaultdict(list))
+    for entry in entries:
+        day = entry['timestamp'][:10]
+        emotion_by_day[entry['emotion']][day] += 1
+        if entry['intensity'] > 0:
+            intensity_by_day[entry['emotion']][day].append(entry['intensity'])
+    days = sorted({d for by_day in emotion_by_day.values() for d in by_day})
+    counts = {e: [by_day.get(d, 0) for d in days] for e, by_day in emotion_by_day.items()}
+    means = {e: {d: sum(v) / len(v) for d, v in by_day.items()} for e, by_day in intensity_by_day.items()}
+    return days, counts, means
+
+
+def bench_trends(args):
+    """Ряды эмоций и интенсивности: numpy (bincount) против вложенных словарей + сверка,
+    недели/месяцы/скользящее окно и отрисовка многолетнего дневника"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import numpy as np
+    from aggregates import summarize
+    from charts import EmotionsByDayChart, IntensityByDayChart
+
+    entries = make_entries(args.count)
+    (days, counts, means), legacy_time = _timed(_legacy_daily_series, entries)
+    aggregates, summarize_time = _timed(summarize, entries)
+    timeline, timeline_time = _timed(aggregates.timeline)
+    (starts, matrix), counts_time = _timed(timeline.counts)
+    (_, mean_matrix), means_time = _timed(timeline.means)
+
+    # Сверка по дням: у numpy-ряда есть и пустые дни (нули), у прежнего — только дни с записями
+    rows = {date.fromisoformat(d).toordinal() - int(starts[0]): d for d in days}
+    for column, emotion in enumerate(timeline.emotions):
+        if [matrix[row, column] for row in rows] != counts[emotion]:
+            raise SystemExit(f"ОШИБКА: число записей расходится ({emotion})")
+        for row, day in rows.items():
+            expected = means[emotion].get(day)
+            actual = mean_matrix[row, column]
+            if (expected is None) != bool(np.isnan(actual)) or (expected is not None and abs(expected - actual) > 1e-9):
+                raise SystemExit(f"ОШИБКА: средняя интенсивность расходится ({emotion}, {day})")
+
+    print(f"Записей: {args.count}, дней: {timeline.span_days}, эмоций: {len(timeline.emotions)}")
+    print(f"Словари и циклы (прежний способ): {legacy_time * 1000:8.1f} мс")
+    print(f"Один проход агрегатов:            {summarize_time * 1000:8.1f} мс")
+    print(f"Колонки numpy:                    {timeline_time * 1000:8.1f} мс")
+    print(f"Число по дням / средние по дням:  {counts_time * 1000:6.2f} / {means_time * 1000:6.2f} мс")
+    for frequency in ('week', 'month'):
+        for window in (None, 7, 30):
+            _, elapsed = _timed(timeline.means, frequency, window)
+            print(f"  средние {frequency:<5} окно {window or '-':>2}: {elapsed * 1000:6.2f} мс")
+    for window in (7, 30):
+        _, elapsed = _timed(timeline.counts, 'day', window)
+        print(f"  число по дням, окно {window}: {elapsed * 1000:6.2f} мс")
+
+    for chart_class in (EmotionsByDayChart, IntensityByDayChart):
+        for frequency in ('day', None):
+            chart = chart_class()
+            chart.attach()
+            chart.set_view(frequency)
+            _, elapsed = _timed(chart.render, aggregates)
+            label = frequency or "авто"
+            print(f"{chart_class.__name__:<20} шаг {label:<4}: отрисовка {elapsed * 1000:8.1f} мс, "
+                  f"точек на линию {len(next(iter(chart.lines.values())).get_xdata())}")
+            chart.close()
+    print("Ряды совпадают")
+
+
+async def _post_requests(port, path, bodies):
+    """Клиент на одном keep-alive соединении: статусы ответов по очереди"""
+    import asyncio
+    import json
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    statuses = []
+    for body in bodies:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        statuses.append(status)
+    writer.close()
+    return statuses
+
+
+def bench_server(args):
+    """HTTP-сервер анализа: одновременные клиенты /analyze, размер пакетов predict и отказы 503"""
+    import asyncio
+    import fasttext
+    from collections import Counter
+    from analyzer import EmotionAnalyzer
+    from server import AnalysisServer
+
+    model = fasttext.load_model(args.model)
+    entries = make_entries(args.clients * args.requests)
+    for entry in entries:
+        entry.pop('emotion')
+        entry.pop('intensity')
+
+    single = EmotionAnalyzer()
+    single.model = model
+    _, loop_time = _timed(lambda: [single.analyze_entry(e) for e in entries[:1000]])
+
+    async def load(max_pending):
+        analyzer = EmotionAnalyzer()
+        analyzer.model = model
+        server = AnalysisServer(analyzer, window_ms=args.window_ms, max_pending=max_pending)
+        listener = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            _post_requests(port, '/analyze', entries[i::args.clients]) for i in range(args.clients)
+        ])
+        elapsed = time.perf_counter() - start
+        listener.close()
+        await listener.wait_closed()
+        server.batcher.shutdown()
+        if analyzer.entries:
+            raise SystemExit("ОШИБКА: сервер копит записи запросов в анализаторе")
+        statuses = Counter(status for client in results for status in client)
+        return elapsed, statuses, server.batcher
+
+    print(f"Клиентов: {args.clients}, запросов на клиента: {args.requests}")
+    print(f"analyze_entry в цикле (без HTTP): {1000 / loop_time:8.0f} записей/с")
+    elapsed, statuses, batcher = asyncio.run(load(4096))
+    total = args.clients * args.requests
+    print(f"Сервер: {total / elapsed:8.0f} запросов/с, пакетов predict: {batcher.batches}, "
+          f"в среднем {batcher.batched_entries / batcher.batches:.1f} записей; ответы {dict(statuses)}")
+    if statuses.get(200) != total:
+        raise SystemExit("ОШИБКА: не все запросы обработаны")
+
+    # Очередь меньше числа клиентов: лишние получают 503 сразу, а не ждут
+    _, statuses, _ = asyncio.run(load(max(1, args.clients // 4)))
+    print(f"Очередь на {max(1, args.clients // 4)} записей: ответы {dict(statuses)}")
+
+
+def bench_users(args):
+    """Много пользователей в одном процессе: LRU сессий под бюджет памяти, попадания и подъёмы из SQLite"""
+    import os
+    import tempfile
+    from analyzer import EmotionAnalyzer
+    from repository import JournalRepository
+    from users import UserSessions
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = JournalRepository(os.path.join(directory, "journal.db"))
+        texts = load_sample_texts()
+        start = time.perf_counter()
+        for user_id in range(1, args.users + 1):
+            journal.for_user(user_id).append_many(make_entries(args.entries, seed=user_id, texts=texts))
+        print(f"Пользователей: {args.users} по {args.entries} записей, база заполнена за {time.perf_counter() - start:.1f} с")
+
+        shared = EmotionAnalyzer(args.model)
+        if args.model and shared.model is None:
+            print("Модель не загружена: замеряются только отчёты")
+        sessions = UserSessions(journal, memory_budget_mb=args.budget_mb, shared=shared)
+
+        # Оценка памяти сессии против замера tracemalloc (после прогрева общих кэшей)
+        import tracemalloc
+        for user_id in (1, 2, 1):
+            sessions._load(user_id).analyzer.generate_long_term_report()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        probe = sessions._load(1)
+        probe.analyzer.generate_long_term_report()
+        traced = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        print(f"Сессия из {len(probe.analyzer.entries)} записей: оценка {probe.size_bytes / 1024:.1f} КБ, "
+              f"замер {traced / 1024:.1f} КБ")
+        del probe
+
+        # Активность неравномерна: небольшая доля пользователей даёт большую часть обращений
+        rnd = random.Random(2)
+        weights = [1 / rank for rank in range(1, args.users + 1)]
+        users = rnd.choices(range(1, args.users + 1), weights=weights, k=args.requests)
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        for user_id in users:
+            sessions.report(user_id)
+        elapsed = time.perf_counter() - start
+
+        stats = sessions.stats()
+        print(f"Запросов отчёта: {args.requests}, {elapsed / args.requests * 1000:.2f} мс на запрос")
+        print(f"В памяти пользователей: {stats['users_in_memory']}, оценка {stats['memory_mb']:.1f} МБ "
+              f"из {stats['budget_mb']:.0f} МБ; попаданий {stats['hit_rate']:.0%}, подъёмов {stats['loads']}, "
+              f"выселений {stats['evictions']}")
+        print(f"RSS: {rss_before:.0f} -> {_rss_mb():.0f} МБ")
+        if stats['memory_mb'] > stats['budget_mb'] and stats['users_in_memory'] > 1:
+            raise SystemExit("ОШИБКА: бюджет памяти превышен")
+        journal.close()
+
+
+def bench_cache(args):
+    """Кэш предсказаний: импорт без кэша, с пустым и с прогретым кэшем (лучшее из --repeat), сверка"""
+    import gc
+    import fasttext
+    from analyzer import EmotionAnalyzer
+    from model_loader import ModelLoader
+    from prediction_cache import PredictionCache, normalize_text
+
+    model = fasttext.load_model(args.model)
+    # Синтетические записи берут тексты из выборки — как шаблонные записи, тексты повторяются
+    entries = make_entries(args.count)
+    for entry in entries:
+        entry.pop('emotion')
+        entry.pop('intensity')
+
+    class Uncached(PredictionCache):
+        """Путь без кэша: один model.predict на весь пакет, как до появления кэша"""
+        def predict(self, model, texts, k=1, threshold=0.0):
+            labels, probs = model.predict(texts, k=k, threshold=threshold)
+            return list(zip(labels, probs))
+
+    warm = PredictionCache()
+
+    def run(make_cache):
+        """Лучшее время analyze_entries; каждый прогон — новым анализатором, чтобы записи не копились"""
+        best = None
+        for _ in range(args.repeat):
+            analyzer = EmotionAnalyzer(model_loader=ModelLoader.from_model(model), prediction_cache=make_cache())
+            gc.collect()
+            result, elapsed = _timed(analyzer.analyze_entries, entries)
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best, analyzer
+
+    # Только шаг предсказания: его и ускоряет кэш
+    texts = [normalize_text(e['text']) for e in entries]
+    _, predict_plain = _timed(Uncached().predict, model, texts)
+    warm.bind(ModelLoader.from_model(model).fingerprint)
+    warm.predict(model, texts)
+    _, predict_warm = _timed(warm.predict, model, texts)
+    warm.clear()
+
+    expected, plain_time, _ = run(Uncached)
+    first, first_time, _ = run(PredictionCache)
+    # Повторный импорт — с кэшем, уже заполненным прошлым запуском (как с кэшем на диске)
+    again, again_time, analyzer = run(lambda: warm)
+    dump = lambda analyses: [a.model_dump() for a in analyses]
+    if not dump(expected) == dump(first) == dump(again):
+        raise SystemExit("ОШИБКА: результаты с кэшем расходятся")
+
+    stats = warm.stats()
+    print(f"Записей: {args.count}, разных текстов: {len(set(texts))}")
+    print(f"predict пакетом:                {predict_plain * 1000:8.1f} мс, из прогретого кэша "
+          f"{predict_warm * 1000:8.1f} мс (x{predict_plain / predict_warm:.1f})")
+    print(f"analyze_entries без кэша:       {plain_time * 1000:8.1f} мс")
+    print(f"analyze_entries с пустым кэшем: {first_time * 1000:8.1f} мс (x{plain_time / first_time:.2f})")
+    print(f"повторный импорт:               {again_time * 1000:8.1f} мс (x{plain_time / again_time:.2f})")
+    print(f"Кэш: {stats['size']} текстов, попаданий {stats['hits']}, промахов {stats['misses']} "
+          f"({stats['hit_rate']:.0%})")
+
+    # Смена модели: отпечаток другой, кэш очищается сам
+    analyzer.model = fasttext.load_model(args.model)
+    analyzer.analyze_entry(entries[0])
+    print(f"После смены модели: текстов в кэше {len(warm)}, сбросов {warm.invalidations}")
+    print("Результаты совпадают")
+
+
+def bench_backfill(args):
+    """Переразметка истории: один процесс, пул и автовыбор; прерывание и продолжение + сверка меток"""
+    import os
+    import signal
+    import subprocess
+    import sys
+    import tempfile
+    import backfill
+    from repository import JournalRepository
+
+    jobs = args.jobs or os.cpu_count() or 2
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "journal.db")
+        journal = JournalRepository(path)
+        journal.append_many(make_entries(args.count))
+        version = backfill.model_version(args.model)
+
+        # 0 — в текущем процессе, jobs — пул принудительно, None — выбор backfill по объёму и ядрам
+        timings = {}
+        for mode in (0, jobs, None):
+            _, timings[mode] = _timed(backfill.backfill, journal, args.model, args.batch_size, mode, True)
+        auto = backfill.auto_jobs(args.count)
+
+        # Прерываем запуск в отдельном процессе, как только он записал первые пачки
+        journal.reset_relabel(version)
+        with journal._lock, journal._conn:
+            journal._conn.execute("UPDATE journal_entries SET model_version = NULL")
+        process = subprocess.Popen(
+            [sys.executable, "backfill.py", "--db", path, "--model", args.model,
+             "--batch-size", str(args.batch_size), "--jobs", str(jobs)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        while process.poll() is None and not journal.relabel_checkpoint(version):
+            time.sleep(0.01)
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+        interrupted_at = journal.relabel_checkpoint(version)
+        resumed = backfill.backfill(journal, args.model, args.batch_size, jobs)
+
+        # Сверка: метки в базе совпадают с предсказанием в текущем процессе
+        backfill._init_worker(args.model)
+        with journal._lock:
+            stored = journal._conn.execute(
+                "SELECT id, primary_emotion, emotion_intensity, recommendations_json, model_version"
+                " FROM journal_entries ORDER BY id"
+            ).fetchall()
+        expected = [label for rows in journal.iter_texts(0, args.batch_size) for label in backfill._predict_chunk(rows)]
+        if [row[:4] for row in stored] != expected or any(row[4] != version for row in stored):
+            raise SystemExit("ОШИБКА: метки или рекомендации после продолжения расходятся")
+
+        # Запись, сохранённая приложением с той же моделью, при повторном запуске не переразмечается
+        new_entry = dict(make_entries(1)[0], model_version=version)
+        journal.append(new_entry)
+        if backfill.backfill(journal, args.model, args.batch_size, 0) != 0:
+            raise SystemExit("ОШИБКА: повторный запуск переразметил уже размеченные записи")
+        journal.close()
+
+    print(f"Записей: {args.count}, пачка {args.batch_size}")
+    print(f"Один процесс:        {timings[0]:6.2f} с")
+    print(f"Процессов {jobs}:         {timings[jobs]:6.2f} с ({timings[0] / timings[jobs]:.1f}x)")
+    print(f"Авто ({f'процессов: {auto}' if auto else 'в текущем процессе'}, ядер {os.cpu_count()}): "
+          f"{timings[None]:6.2f} с ({timings[jobs] / timings[None]:.1f}x к пулу из {jobs})")
+    print(f"Прерван на id={interrupted_at}, продолжение переразметило {resumed} записей")
+    print("Метки совпадают")
+
+
+def _legacy_initial_load(journal, analyzer):
+    """Прежняя загрузка main_app: весь fetchall дважды, копии в JournalEntry и в словари дневника"""
+    from data_models import JournalEntry
+    from repository import SELECT_ALL
+
+    def load():
+        with journal._lock:
+            rows = journal._conn.execute(SELECT_ALL, (journal.user_id,)).fetchall()
+        return [journal._row_to_entry(row) for row in rows]
+
+    entries = load()
+    entries.reverse()
+    # Анализатор держал вторую копию в JournalEntry (models); сейчас он хранит словари,
+    # поэтому агрегаты строятся по первой копии, а models живут до конца загрузки, как раньше
+    models = [JournalEntry(**entry) for entry in load()]
+    analyzer.entries = entries[::-1]
+    diary = []
+    for entry in entries:
+        diary.append({
+            'id': entry.get('id'),
+            'timestamp': entry.get('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M')),
+            'text': entry.get('text', ''),
+            'triggers': entry.get('triggers', []),
+            'physical_sensations': entry.get('physical_sensations', []),
+            'thoughts': entry.get('thoughts', []),
+            'emotion': entry.get('emotion', '')
+        })
+    del models
+    return entries, diary
+
+
+def _shared_initial_load(journal, analyzer):
+    """Как main_app сейчас: одно постраничное чтение, анализатор и дневник ссылаются на те же словари"""
+    history = [entry for entry in journal.iter_entries() if isinstance(entry, dict)]
+    analyzer.entries = history
+    entries = history[::-1]
+    now = datetime.now().strftime('%Y-%m-%d %H:%M')
+    for entry in entries:
+        entry.setdefault('id', None)
+        entry.setdefault('timestamp', now)
+        entry.setdefault('text', '')
+        for field in ('triggers', 'physical_sensations', 'thoughts'):
+            entry.setdefault(field, [])
+        entry.setdefault('emotion', '')
+    return entries, list(entries)
+
+
+def _measure_load(args):
+    """Один замер в отдельном процессе: пик RSS не смешивается с другими замерами"""
+    import json
+    import resource
+    from analyzer import EmotionAnalyzer
+    from model_loader import ModelLoader
+    from repository import JournalRepository
+
+    journal = JournalRepository(args.db)
+    analyzer = EmotionAnalyzer(model_loader=ModelLoader.from_model(None))
+    before = _rss_mb()
+    load = _legacy_initial_load if args.measure == 'legacy' else _shared_initial_load
+    (entries, diary), seconds = _timed(load, journal, analyzer)
+    # ru_maxrss в Linux — в КБ
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": seconds, "before_mb": before, "peak_mb": peak, "count": len(diary)}))
+
+
+def bench_load(args):
+    """Загрузка дневника при запуске: прежние три копии против одного общего хранилища (время и пик RSS)"""
+    import json
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    from repository import JournalRepository
+
+    if args.measure:
+        return _measure_load(args)
+
+    texts = load_sample_texts()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f"journal_{size}.db")
+            journal = JournalRepository(path)
+            # База заполняется частями, чтобы сам генератор не занимал память на миллион записей
+            for offset in range(0, size, 50000):
+                journal.append_many(make_entries(min(50000, size - offset), seed=offset, texts=texts, offset=offset))
+            journal.close()
+
+            results = {}
+            for mode in ('legacy', 'shared'):
+                output = subprocess.run(
+                    [sys.executable, "benchmark.py", "load", "--measure", mode, "--db", path],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                results[mode] = json.loads(output.strip().splitlines()[-1])
+                if results[mode]["count"] != size:
+                    raise SystemExit(f"ОШИБКА: {mode} загрузил {results[mode]['count']} записей из {size}")
+
+            legacy, shared = results['legacy'], results['shared']
+            print(f"{size:>8} записей: прежняя {legacy['seconds']:6.2f} с, пик {legacy['peak_mb']:7.0f} МБ"
+                  f" (+{legacy['peak_mb'] - legacy['before_mb']:.0f}); общая {shared['seconds']:6.2f} с,"
+                  f" пик {shared['peak_mb']:7.0f} МБ (+{shared['peak_mb'] - shared['before_mb']:.0f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности MentalHealthApp")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    batch = subparsers.add_parser("batch", help=bench_batch.__doc__)
+    batch.add_argument("--model", default="model/emotion_model.bin")
+    batch.add_argument("--count", type=int, default=5000)
+    batch.set_defaults(func=bench_batch)
+
+    report = subparsers.add_parser("report", help=bench_report.__doc__)
+    report.add_argument("--count", type=int, default=20000)
+    report.add_argument("--appends", type=int, default=100)
+    report.set_defaults(func=bench_report)
+
+    save = subparsers.add_parser("save", help=bench_save.__doc__)
+    save.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    save.add_argument("--saves", type=int, default=5)
+    save.set_defaults(func=bench_save)
+
+    charts = subparsers.add_parser("charts", help=bench_charts.__doc__)
+    charts.add_argument("--count", type=int, default=5000)
+    charts.add_argument("--applies", type=int, default=1000)
+    charts.add_argument("--every", type=int, default=100, help="как часто снимать замер памяти")
+    charts.add_argument("--legacy", type=int, default=50, help="применений для прежнего способа")
+    charts.set_defaults(func=bench_charts)
+
+    chart_tabs = subparsers.add_parser("chart-tabs", help=bench_chart_tabs.__doc__)
+    chart_tabs.add_argument("--count", type=int, default=20000)
+    chart_tabs.add_argument("--applies", type=int, default=50)
+    chart_tabs.add_argument("--states", type=int, default=5)
+    chart_tabs.set_defaults(func=bench_chart_tabs)
+
+    filter_ = subparsers.add_parser("filter", help=bench_filter.__doc__)
+    filter_.add_argument("--count", type=int, default=100000)
+    filter_.add_argument("--repeat", type=int, default=5)
+    filter_.set_defaults(func=bench_filter)
+
+    trends = subparsers.add_parser("trends", help=bench_trends.__doc__)
+    trends.add_argument("--count", type=int, default=100000)
+    trends.set_defaults(func=bench_trends)
+
+    server = subparsers.add_parser("server", help=bench_server.__doc__)
+    server.add_argument("--model", default="model/emotion_model.bin")
+    server.add_argument("--clients", type=int, default=64)
+    server.add_argument("--requests", type=int, default=50)
+    server.add_argument("--window-ms", type=float, default=5)
+    server.set_defaults(func=bench_server)
+
+    users = subparsers.add_parser("users", help=bench_users.__doc__)
+    users.add_argument("--model", default="model/emotion_model.bin")
+    users.add_argument("--users", type=int, default=2000)
+    users.add_argument("--entries", type=int, default=50, help="записей на пользователя")
+    users.add_argument("--requests", type=int, default=20000)
+    users.add_argument("--budget-mb", type=float, default=16)
+    users.set_defaults(func=bench_users)
+
+    cache = subparsers.add_parser("cache", help=bench_cache.__doc__)
+    cache.add_argument("--model", default="model/emotion_model.bin")
+    cache.add_argument("--count", type=int, default=20000)
+    cache.add_argument("--repeat", type=int, default=3)
+    cache.set_defaults(func=bench_cache)
+
+    relabel = subparsers.add_parser("backfill", help=bench_backfill.__doc__)
+    relabel.add_argument("--model", default="model/emotion_model.bin")
+    relabel.add_argument("--count", type=int, default=200000)
+    relabel.add_argument("--batch-size", type=int, default=4096)
+    relabel.add_argument("--jobs", type=int, default=None, help="процессов (по умолчанию — по числу ядер)")
+    relabel.set_defaults(func=bench_backfill)
+
+    load = subparsers.add_parser("load", help=bench_load.__doc__)
+    load.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    # Служебные: замер одной загрузки в дочернем процессе
+    load.add_argument("--measure", choices=["legacy", "shared"], help=argparse.SUPPRESS)
+    load.add_argument("--db", help=argparse.SUPPRESS)
+    load.set_defaults(func=bench_load)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,243 @@
-import tkinter as tk
-from tkinter import ttk
-import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from collections import Counter
-from datetime import datetime
-
-
-class EmotionChart:
-    def __init__(self, parent, entries):
-        self.parent = parent
-        self.entries = entries
-        self._setup_ui()
-
-    def _setup_ui(self):
-        self.frame = ttk.Frame(self.parent)
-        self.fig, self.ax = plt.subplots(figsize=(8, 4))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.frame)
-        self.canvas.get_tk_widget().pack(fill='both', expand=True)
-        self.update_chart()
-
-    def update_chart(self, filtered_entries=None):
-        entries = filtered_entries if filtered_entries else self.entries
-        emotions = [e.get('emotion', '') for e in entries if e.get('emotion')]
-
-        self.ax.clear()
-        if emotions:
-            emotion_counts = Counter(emotions)
-            self.ax.bar(emotion_counts.keys(), emotion_counts.values(), color='#4db6ac')
-            self.ax.set_title('Распределение эмоций')
-            self.ax.set_ylabel('Количество')
-        self.canvas.draw()
-
-
-class TriggerChart:
-    def __init__(self, parent, entries):
-        self.parent = parent
-        self.entries = entries
-        self._setup_ui()
-
-    def _setup_ui(self):
-        self.frame = ttk.Frame(self.parent)
-        self.fig, self.ax = plt.subplots(figsize=(8, 4))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.frame)
-        self.canvas.get_tk_widget().pack(fill='both', expand=True)
-        self.update_chart()
-
-    def update_chart(self, filtered_entries=None):
-        entries = filtered_entries if filtered_entries else self.entries
-        triggers = []
-        for entry in entries:
-            triggers.extend(entry.get('triggers', []))
-
-        self.ax.clear()
-        if triggers:
-            trigger_counts = Counter(triggers)
-            top_triggers = trigger_counts.most_common(10)
-            self.ax.barh([t[0] for t in top_triggers],
-                         [t[1] for t in top_triggers],
-                         color='#4db6ac')
-            self.ax.set_title('Топ 10 триггеров')
-            self.ax.set_xlabel('Количество')
-        self.canvas.draw()
-
-
-class SensationChart:
-    def __init__(self, parent, entries):
-        self.parent = parent
-        self.entries = entries
-        self._setup_ui()
-
-    def _setup_ui(self):
-        self.frame = ttk.Frame(self.parent)
-        self.fig, self.ax = plt.subplots(figsize=(8, 4))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.frame)
-        self.canvas.get_tk_widget().pack(fill='both', expand=True)
-        self.update_chart()
-
-    def update_chart(self, filtered_entries=None):
-        entries = filtered_entries if filtered_entries else self.entries
-        sensations = []
-        for entry in entries:
-            sensations.extend(entry.get('physical_sensations', []))
-
-        self.ax.clear()
-        if sensations:
-            sensation_counts = Counter(sensations)
-            top_sensations = sensation_counts.most_common(10)
-            self.ax.barh([t[0] for t in top_sensations],
-                         [t[1] for t in top_sensations],
-                         color='#4db6ac')
-            self.ax.set_title('Топ 10 физических ощущений')
-            self.ax.set_xlabel('Количество')
-        self.canvas.draw()
\ No newline at end of file
+from datetime import date
+
+import numpy as np
+
+from aggregates import summarize
+from timeseries import FREQUENCY_LABELS, auto_frequency
+
+
+# --- Графики вкладки «Дневник» ---
+
+class DiaryChart:
+    """График дневника: Figure, Axes и холст создаются один раз, фильтр меняет только данные.
+
+    Фигура создаётся через matplotlib.figure.Figure, а не pyplot, поэтому не попадает
+    в реестр pyplot и освобождается вместе с графиком (close()). Данные график берёт
+    из общих агрегатов (aggregates.DiaryAggregates), а не проходит по записям сам.
+    """
+
+    title = ""
+    xlabel = ""
+    ylabel = ""
+
+    def __init__(self, figsize=(8, 4)):
+        self.figure = Figure(figsize=figsize)
+        self.ax = self.figure.add_subplot()
+        self.canvas = None
+        # dirty — данные изменились, а график ещё не перерисован
+        self.dirty = True
+        self.ax.set_title(self.title)
+        self.ax.set_xlabel(self.xlabel)
+        self.ax.set_ylabel(self.ylabel)
+        self._setup_axes()
+
+    def attach(self, parent=None):
+        """Встраивает график в Tk-контейнер; без parent — холст Agg вне экрана (замеры)"""
+        if parent is None:
+            self.canvas = FigureCanvasAgg(self.figure)
+        else:
+            self.canvas = FigureCanvasTkAgg(self.figure, master=parent)
+            self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        return self.canvas
+
+    def update(self, entries):
+        self.render(summarize(entries))
+
+    def render(self, aggregates):
+        """Рисует график по агрегатам отфильтрованных записей"""
+        self.apply(self.series(aggregates))
+        self.redraw()
+        self.dirty = False
+
+    def redraw(self):
+        if self.canvas is not None:
+            self.canvas.draw_idle()
+
+    def close(self):
+        """Освобождает холст и все объекты фигуры"""
+        if isinstance(self.canvas, FigureCanvasTkAgg):
+            self.canvas.get_tk_widget().destroy()
+        self.canvas = None
+        self.figure.clear()
+
+    def _setup_axes(self):
+        pass
+
+    def series(self, aggregates):
+        raise NotImplementedError
+
+    def apply(self, series):
+        raise NotImplementedError
+
+
+class _DailyLinesChart(DiaryChart):
+    """Линия на каждую эмоцию по времени; линии создаются один раз и обновляются через set_data.
+
+    Ряды считает EmotionTimeline (numpy). Шаг frequency (None — по длине периода, чтобы
+    многолетний дневник не превращался в тысячи точек) и скользящее окно window в днях
+    задаются через set_view.
+    """
+
+    fixed_ylim = None
+    frequency = None
+    window = None
+
+    def _setup_axes(self):
+        self.lines = {}
+        self._legend_labels = ()
+        locator = mdates.AutoDateLocator()
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.ax.grid(True)
+        if self.fixed_ylim:
+            self.ax.set_ylim(*self.fixed_ylim)
+
+    def set_view(self, frequency=None, window=None):
+        self.frequency = frequency
+        self.window = window
+        self.dirty = True
+
+    def series(self, aggregates):
+        """(шаг, {эмоция: (даты в числах matplotlib, значения)})"""
+        timeline = aggregates.timeline()
+        if not len(timeline):
+            return self.frequency or 'day', {}
+        frequency = self.frequency or auto_frequency(timeline.span_days)
+        starts, matrix = self.matrix(timeline, frequency)
+        # Порядковый номер дня -> число matplotlib: сдвиг от первого дня, без datetime на точку
+        xs = mdates.date2num(date.fromordinal(int(starts[0]))) + (starts - starts[0])
+        lines = {}
+        for column, emotion in enumerate(timeline.emotions):
+            values = matrix[:, column]
+            present = ~np.isnan(values)
+            if present.any():
+                lines[emotion] = (xs[present], values[present])
+        return frequency, lines
+
+    def matrix(self, timeline, frequency):
+        raise NotImplementedError
+
+    def apply(self, series):
+        frequency, series = series
+        window = f", окно {self.window} дн." if self.window else ""
+        self.ax.set_title(f"{self.title} ({FREQUENCY_LABELS[frequency]}{window})")
+        for label, line in self.lines.items():
+            if label not in series:
+                line.set_data([], [])
+                line.set_visible(False)
+
+        for label, (xs, ys) in series.items():
+            line = self.lines.get(label)
+            if line is None:
+                line, = self.ax.plot([], [], marker='o', label=label)
+                self.lines[label] = line
+            line.set_data(xs, ys)
+            line.set_visible(True)
+
+        if series:
+            self.ax.relim(visible_only=True)
+            self.ax.autoscale_view(scaley=self.fixed_ylim is None)
+
+        # Легенду пересоздаём, только если изменился набор эмоций
+        labels = tuple(sorted(series))
+        if labels != self._legend_labels:
+            self._legend_labels = labels
+            if labels:
+                self.ax.legend(handles=[self.lines[label] for label in labels])
+            elif self.ax.get_legend() is not None:
+                self.ax.get_legend().remove()
+
+
+class EmotionsByDayChart(_DailyLinesChart):
+    title = "Динамика эмоций"
+    xlabel = "Дата"
+    ylabel = "Количество"
+
+    def matrix(self, timeline, frequency):
+        # Интервалы без записей эмоции — нули: у всех линий общий набор дат
+        return timeline.counts(frequency, self.window)
+
+
+class IntensityByDayChart(_DailyLinesChart):
+    title = "Интенсивность эмоций"
+    xlabel = "Дата"
+    ylabel = "Средняя интенсивность (0–10)"
+    fixed_ylim = (0, 10)
+    # Подписи значений только на коротких рядах: тысячи подписей рисуются секундами и не читаются
+    max_annotations = 100
+
+    def _setup_axes(self):
+        super()._setup_axes()
+        self.annotations = []
+
+    def matrix(self, timeline, frequency):
+        # Интервалы без оценённых записей (NaN) пропускаются, линия соединяет соседние точки
+        return timeline.means(frequency, self.window)
+
+    def apply(self, series):
+        super().apply(series)
+        _, series = series
+
+        # Подписи к точкам: старые удаляем, чтобы они не копились в Axes
+        for annotation in self.annotations:
+            annotation.remove()
+        self.annotations = [
+            self.ax.annotate(f"{value:.1f}", (x, value), textcoords="offset points", xytext=(0, 5), ha='center')
+            for xs, ys in series.values()
+            for x, value in zip(xs, ys)
+        ] if sum(len(xs) for xs, _ in series.values()) <= self.max_annotations else []
+
+
+class _TopBarsChart(DiaryChart):
+    """Горизонтальные столбцы топ-N; прямоугольники создаются один раз, меняется их ширина"""
+
+    counts = ""  # имя счётчика в DiaryAggregates
+    color = '#4db6ac'
+    top = 10
+
+    def _setup_axes(self):
+        positions = range(self.top)
+        self.bars = self.ax.barh(positions, [0] * self.top, color=self.color)
+        self.ax.set_yticks(positions)
+        self.ax.set_yticklabels([''] * self.top)
+        self.ax.invert_yaxis()
+
+    def series(self, aggregates):
+        return getattr(aggregates, self.counts).most_common(self.top)
+
+    def apply(self, series):
+        labels = [label for label, _ in series] + [''] * (self.top - len(series))
+        counts = [count for _, count in series] + [0] * (self.top - len(series))
+        for bar, count in zip(self.bars, counts):
+            bar.set_width(count)
+        self.ax.set_yticklabels(labels)
+        self.ax.set_xlim(0, max(counts) * 1.1 if max(counts) else 1)
+
+
+class TopTriggersChart(_TopBarsChart):
+    title = "Частые триггеры"
+    xlabel = "Частота"
+    ylabel = "Триггеры"
+    counts = 'trigger_counts'
+
+
+class TopThoughtsChart(_TopBarsChart):
+    title = "Частые мысли"
+    xlabel = "Частота"
+    ylabel = "Мысли"
+    counts = 'thought_counts'
+    color = '#ff8a65'
+
+
+def diary_charts():
+    """Графики вкладки дневника в порядке вкладок: (заголовок вкладки, график)"""
+    return [
+        ("Эмоции по дням", EmotionsByDayChart()),
+        ("Триггеры", TopTriggersChart()),
+        ("Частые мысли", TopThoughtsChart()),
+        ("Интенсивность эмоций", IntensityByDayChart()),
+    ]
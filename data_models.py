@@ -4,6 +4,7 @@ from pydantic import BaseModel
 
 # 📘 Запись в дневнике
 class JournalEntry(BaseModel):
+    id: Optional[int] = None  # назначается при создании записи и сохраняется в хранилище
     timestamp: str
     text: str
     triggers: List[str]
@@ -17,6 +18,7 @@ class ImmediateAnalysis(BaseModel):
     manifested_emotion: str
     intensity: int
     recommendation: Dict[str, Union[List[str], Dict[str, Union[str, List[str]]]]]
+    emotion_probabilities: Dict[str, float] = {}  # при пакетном анализе с k > 1
     # Поддерживает:
     # - short_term: List[str]
     # - scientific_references: List[str]
@@ -0,0 +1,120 @@
+# diary_index.py - Колоночный индекс записей дневника для быстрых фильтров
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date
+
+from search_index import TextIndex
+
+
+class DiaryIndex:
+    """Колонки записей, подготовленные один раз на изменение данных.
+
+    Записи упорядочены по времени, поэтому номер строки и есть её место в сортировке:
+    диапазон дат — это отрезок строк (bisect по порядковым номерам дней), а эмоции
+    и триггеры хранят отсортированные списки номеров строк, текстовый поиск идёт через
+    инвертированный индекс (search_index.TextIndex). Фильтр сводится к срезам
+    и пересечениям без разбора дат и без обхода всех записей.
+    """
+
+    def __init__(self, entries=(), key=None, stemming=True):
+        self.key = key or (lambda entry: entry.get('id'))
+        self.text_index = TextIndex(stemming)
+        self.build(entries)
+
+    def build(self, entries):
+        ordered = sorted(entries, key=lambda e: e.get('timestamp', ''))
+
+        self.keys = []
+        self.ordinals = []
+        self.by_emotion = defaultdict(list)
+        self.by_trigger = defaultdict(list)
+        # Записи с неразборчивой датой фильтр по датам не отбрасывает (как и прежде)
+        self.undated = []
+
+        # Дата разбирается один раз на день, а не на каждую запись
+        self._day_ordinals = {}
+        dated = [(self._ordinal(entry), entry) for entry in ordered]
+
+        # Недатированные уходят в начало, чтобы порядковые номера дней шли по возрастанию
+        dated.sort(key=lambda item: item[0] is not None)
+        for row, (ordinal, entry) in enumerate(dated):
+            self._append_row(row, ordinal, entry)
+
+        self.text_index.build(entry for _, entry in dated)
+        self._last_timestamp = dated[-1][1].get('timestamp', '') if dated and dated[-1][0] is not None else None
+
+    def add(self, entry):
+        """Дописывает запись без перестройки, если она не старше последней.
+
+        False — запись нужно вставлять в середину, индекс надо перестроить (build).
+        """
+        ordinal = self._ordinal(entry)
+        timestamp = entry.get('timestamp', '')
+        if ordinal is None or (self._last_timestamp is not None and timestamp < self._last_timestamp):
+            return False
+        row = len(self.keys)
+        self._append_row(row, ordinal, entry)
+        self.text_index.add(row, entry)
+        self._last_timestamp = timestamp
+        return True
+
+    def _ordinal(self, entry):
+        day = entry.get('timestamp', '')[:10]
+        if day not in self._day_ordinals:
+            try:
+                self._day_ordinals[day] = date.fromisoformat(day).toordinal()
+            except ValueError:
+                self._day_ordinals[day] = None
+        return self._day_ordinals[day]
+
+    def _append_row(self, row, ordinal, entry):
+        self.keys.append(self.key(entry))
+        self.ordinals.append(ordinal if ordinal is not None else 0)
+        if ordinal is None:
+            self.undated.append(row)
+        if entry.get('emotion'):
+            self.by_emotion[entry['emotion']].append(row)
+        for trigger in set(entry.get('triggers', [])):
+            self.by_trigger[trigger].append(row)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def query(self, emotion=None, trigger=None, date_from=None, date_to=None, search_text='', search_in=None):
+        """Ключи записей, прошедших фильтр, от новых к старым"""
+        undated, total = len(self.undated), len(self.keys)
+        if date_from or date_to:
+            low = bisect_left(self.ordinals, date_from.toordinal(), undated) if date_from else undated
+            high = bisect_right(self.ordinals, date_to.toordinal(), undated) if date_to else total
+            # Строки [0, undated) — записи без даты, их фильтр по датам пропускает
+            ranges = [(0, undated), (low, high)]
+        else:
+            ranges = [(0, total)]
+
+        # Отсортированные списки строк от каждого фильтра
+        row_lists = [column.get(value, []) for value, column in
+                     ((emotion, self.by_emotion), (trigger, self.by_trigger)) if value]
+        if search_text:
+            found = self.text_index.search(search_text, search_in)
+            if found is not None:
+                row_lists.append(found)
+
+        if not row_lists:
+            # Только даты: ответ — срезы колонки ключей
+            return [key for start, end in reversed(ranges) for key in reversed(self.keys[start:end])]
+
+        # Самый короткий список режем по диапазону дат двоичным поиском, с остальными пересекаем
+        row_lists.sort(key=len)
+        shortest = row_lists[0]
+        rows = [row for start, end in ranges
+                for row in shortest[bisect_left(shortest, start):bisect_left(shortest, end)]]
+        for other in row_lists[1:]:
+            rows = [row for row in rows if _contains(other, row)]
+
+        keys = self.keys
+        return [keys[row] for row in reversed(rows)]
+
+
+def _contains(sorted_rows, row):
+    position = bisect_left(sorted_rows, row)
+    return position < len(sorted_rows) and sorted_rows[position] == row
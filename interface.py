@@ -1,10 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 from collections import defaultdict, Counter
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime
 from tkcalendar import DateEntry
+from virtual_table import VirtualTable
+from charts import diary_charts
+from aggregates import AggregationEngine
+from diary_index import DiaryIndex
+from search_index import entry_matches
+from timing import get_timer
+
+# Пауза после последнего нажатия клавиши, после которой фильтр применяется сам
+FILTER_DEBOUNCE_MS = 250
+# Шаг и сглаживание рядов на графиках динамики (None — шаг по длине периода / без окна)
+CHART_STEPS = {"Авто": None, "Дни": 'day', "Недели": 'week', "Месяцы": 'month'}
+CHART_WINDOWS = {"Нет": None, "7 дней": 7, "30 дней": 30}
 
 
 class JournalEntryForm(tk.Frame):
@@ -95,6 +105,15 @@ class JournalEntryForm(tk.Frame):
 
         self.on_submit(entry_data)
 
+    def set_processing(self, processing):
+        """Состояние «идёт анализ»: кнопка недоступна, пока запись обрабатывается"""
+        if processing:
+            self.btn_submit.config(text="Обработка...", state='disabled')
+            self.status_var.set("Анализируем запись...")
+        else:
+            self.btn_submit.config(text="Проанализировать", state='normal')
+            self.status_var.set("")
+
     def show_analysis(self, analysis):
         self.analysis_text.config(state='normal')
         self.analysis_text.delete(1.0, tk.END)
@@ -133,7 +152,26 @@ class JournalEntryForm(tk.Frame):
 class DiaryView(tk.Frame):
     def __init__(self, parent, entries):
         super().__init__(parent)
+        # Тот же список, что у приложения (не копия): новые записи дописывает сам дневник
         self.entries = entries
+        # Записи по ключу (id из хранилища); таблица держит только ключи видимого порядка
+        self.entry_store = {}
+        self._rebuild_store()
+        # Последние применённые фильтры (пусто — показываются все записи)
+        self._applied_filters = {}
+        # Версия данных: меняется при любом изменении записей, входит в ключ кэша графиков
+        self._data_version = 0
+        self._chart_entries = None
+        # Агрегаты по (версия данных, фильтр): один проход по записям на все графики и списки фильтров
+        self.aggregation = AggregationEngine()
+        # Колоночный индекс для фильтров; перестраивается лениво после изменения данных
+        self.index = DiaryIndex(key=self._entry_key)
+        self._index_stale = True
+        # Живой фильтр: отложенный запуск и номер прохода (устаревшие проходы не рисуются)
+        self._filter_job = None
+        self._filter_generation = 0
+        self.filter_timer = get_timer("Дневник: фильтр", budget_ms=50)
+        self.chart_timer = get_timer("Дневник: график", budget_ms=200)
         self.configure(bg='#e0f7fa')
 
         self._prepare_filter_data()
@@ -174,39 +212,159 @@ class DiaryView(tk.Frame):
 
         return tags
 
+    def _format_row(self, entry):
+        """Значения и теги строки таблицы — вызывается только для видимых строк"""
+        timestamp = entry.get('timestamp', '')
+        emotion = entry.get('emotion', '')
+        triggers = ', '.join(entry.get('triggers', []))
+        preview = ' '.join(entry.get('text', '').split()[:5]) + '...' if entry.get('text') else ''
+        return (timestamp, emotion, triggers, preview), self._get_entry_tags(entry)
+
+    @staticmethod
+    def _entry_key(entry):
+        # Записи без id (ещё не сохранённые) различаем по объекту
+        entry_id = entry.get('id')
+        return entry_id if entry_id is not None else ('local', id(entry))
+
+    def _rebuild_store(self):
+        # Словарь меняем на месте: таблица держит ссылку на его метод get
+        self.entry_store.clear()
+        self.entry_store.update((self._entry_key(e), e) for e in self.entries)
+
+    def _show_entries(self, entries):
+        """Передаёт таблице порядок строк (новые сверху); строки создаются только для окна"""
+        keys = []
+        for entry in sorted(entries, key=lambda e: e.get('timestamp', ''), reverse=True):
+            key = self._entry_key(entry)
+            # Результаты запроса к базе — новые объекты; показываем те же записи из хранилища
+            self.entry_store.setdefault(key, entry)
+            keys.append(key)
+        self.table.set_keys(keys)
+
+    def _sorted_position(self, entry):
+        """Позиция записи в таблице (новые сверху) — двоичный поиск по отметкам времени"""
+        timestamp = entry.get('timestamp', '')
+        keys = self.table.keys
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry_store[keys[middle]].get('timestamp', '') > timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
     def update_entries(self, new_entries):
         """Обновляет таблицу и графики дневника новыми записями."""
         self.entries = new_entries
+        self._rebuild_store()
+        self._applied_filters = {}
+        self._data_version += 1
+        self._index_stale = True
+        self._show_entries(self.entries)
+        self._prepare_filter_data()
+        self._refresh_filter_values()
+
+        # Обновляем графики
+        self._update_charts(self.entries)
 
-        # Очистка таблицы
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Сортировка и добавление записей
-        sorted_entries = sorted(self.entries, key=lambda x: x.get('timestamp', ''), reverse=True)
-        for entry in sorted_entries:
-            timestamp = entry.get('timestamp', '')
-            emotion = entry.get('emotion', '')
-            triggers = ', '.join(entry.get('triggers', []))
-            preview = ' '.join(entry.get('text', '').split()[:5]) + '...' if entry.get('text') else ''
-
-            item_id = self.tree.insert('', 'end',
-                                       values=(timestamp, emotion, triggers, preview),
-                                       tags=self._get_entry_tags(entry))
-            setattr(self.tree, f'entry_{item_id}', entry)
-
-        # Обновляем графики, если они есть
-        if hasattr(self, 'emotion_chart'):
-            self.emotion_chart.update_chart(self.entries)
-        if hasattr(self, 'trigger_chart'):
-            self.trigger_chart.update_chart(self.entries)
-        if hasattr(self, 'sensation_chart'):
-            self.sensation_chart.update_chart(self.entries)
+    def apply_changes(self, added=(), updated=(), removed=()):
+        """Точечно обновляет таблицу и списки фильтров вместо полной перестройки.
+
+        added/updated — записи, removed — записи или их id.
+        """
+        values_changed = False
+
+        removed_keys = set()
+        for entry in removed:
+            key = self._entry_key(entry) if isinstance(entry, dict) else entry
+            old = self.entry_store.pop(key, None)
+            if old is None:
+                continue
+            removed_keys.add(key)
+            values_changed |= self._count_filter_values(old, -1)
+            self.table.remove_key(key)
+        if removed_keys:
+            # На месте: список общий с приложением
+            self.entries[:] = [e for e in self.entries if self._entry_key(e) not in removed_keys]
+
+        for entry in updated:
+            key = self._entry_key(entry)
+            old = self.entry_store.get(key)
+            if old is not None:
+                values_changed |= self._count_filter_values(old, -1)
+                if old is not entry:
+                    position = next(i for i, e in enumerate(self.entries) if e is old)
+                    self.entries[position] = entry
+            self.entry_store[key] = entry
+            values_changed |= self._count_filter_values(entry, 1)
+
+            # Дата или эмоция могли измениться — переставляем строку, сохраняя выделение
+            selected = self.table.selected_key == key
+            self.table.remove_key(key)
+            if self._passes_filters(entry, self._applied_filters):
+                self.table.insert_key(self._sorted_position(entry), key)
+                if selected:
+                    self.table.selected_key = key
+                    self.table.refresh_key(key)
+
+        for entry in added:
+            key = self._entry_key(entry)
+            self.entry_store[key] = entry
+            # Дописываем в конец: порядок строк задаёт таблица, а вставка в начало — O(N)
+            self.entries.append(entry)
+            # Новая запись обычно самая свежая — индекс дописывается без перестройки
+            if not self._index_stale and not self.index.add(entry):
+                self._index_stale = True
+            values_changed |= self._count_filter_values(entry, 1)
+            if self._passes_filters(entry, self._applied_filters):
+                self.table.insert_key(self._sorted_position(entry), key)
+
+        if values_changed:
+            self._refresh_filter_values()
+
+        if updated or removed_keys:
+            self._index_stale = True
+        if added or updated or removed_keys:
+            states = {self._chart_state(): [e for e in added if self._passes_filters(e, self._applied_filters)],
+                      (self._data_version, ()): list(added)}
+            self._data_version += 1
+            if not (updated or removed_keys):
+                # Только новые записи — агрегаты графиков и фильтров дополняются, без прохода по дневнику
+                for state, entries in states.items():
+                    self.aggregation.advance(state, (self._data_version,) + state[1:], entries)
+            # Графики строятся по строкам таблицы — она уже учитывает фильтр
+            self._update_charts()
+
+    def _count_filter_values(self, entry, delta):
+        """Учитывает значения записи для списков фильтров; True — если набор значений изменился"""
+        changed = False
+        emotion = entry.get('emotion')
+        items = [(self.emotion_counts, emotion)] if emotion else []
+        items += [(self.trigger_counts, t) for t in entry.get('triggers', [])]
+        for counts, value in items:
+            counts[value] += delta
+            if counts[value] <= 0:
+                del counts[value]
+                changed = True
+            elif delta > 0 and counts[value] == delta:
+                changed = True
+        return changed
+
+    def _refresh_filter_values(self):
+        self.all_triggers = sorted(self.trigger_counts)
+        self.emotion_filter['values'] = self._get_unique_emotions()
+        self.trigger_filter['values'] = self.all_triggers
 
     def _prepare_filter_data(self):
-        self.all_triggers = sorted(set(t for e in self.entries for t in e.get('triggers', [])))
-        self.all_sensations = sorted(set(s for e in self.entries for s in e.get('physical_sensations', [])))
-        self.all_thoughts = sorted(set(t for e in self.entries for t in e.get('thoughts', [])))
+        # Агрегаты всех записей без фильтра — те же, что получат графики при пустом фильтре
+        aggregates = self.aggregation.get((self._data_version, ()), self.entries)
+        # Счётчики значений: значение пропадает из списка фильтра, когда счётчик обнуляется
+        self.emotion_counts = Counter({e: n for e, n in aggregates.emotion_counts.items() if e})
+        self.trigger_counts = Counter(aggregates.trigger_counts)
+        self.all_triggers = sorted(self.trigger_counts)
+        self.all_sensations = sorted(aggregates.sensation_counts)
+        self.all_thoughts = sorted(aggregates.thought_counts)
 
     def _setup_styles(self):
         self.style.configure('Diary.TFrame', background='#e0f7fa')
@@ -228,251 +386,198 @@ class DiaryView(tk.Frame):
         ttk.Label(self.filter_frame, text="Эмоция:").grid(row=1, column=0, sticky='w')
         self.emotion_filter = ttk.Combobox(self.filter_frame, values=self._get_unique_emotions())
         self.emotion_filter.grid(row=1, column=1, sticky='ew', padx=5, pady=2)
-        ttk.Label(self.filter_frame, text="Дата с:").grid(row=2, column=0, sticky='w')
+        ttk.Label(self.filter_frame, text="Триггер:").grid(row=2, column=0, sticky='w')
+        self.trigger_filter = ttk.Combobox(self.filter_frame, values=self.all_triggers)
+        self.trigger_filter.grid(row=2, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Label(self.filter_frame, text="Дата с:").grid(row=3, column=0, sticky='w')
         self.date_from = DateEntry(self.filter_frame, width=12, background='darkblue',
                                    foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd')
-        self.date_from.grid(row=2, column=1, sticky='ew', padx=5, pady=2)
-        ttk.Label(self.filter_frame, text="Дата по:").grid(row=3, column=0, sticky='w')
+        self.date_from.grid(row=3, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Label(self.filter_frame, text="Дата по:").grid(row=4, column=0, sticky='w')
         self.date_to = DateEntry(self.filter_frame, width=12, background='darkblue',
                                  foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd')
-        self.date_to.grid(row=3, column=1, sticky='ew', padx=5, pady=2)
-        ttk.Label(self.filter_frame, text="Поиск по тексту:").grid(row=4, column=0, sticky='w')
+        self.date_to.grid(row=4, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Label(self.filter_frame, text="Поиск по началу слов:").grid(row=5, column=0, sticky='w')
         self.search_entry = ttk.Entry(self.filter_frame)
-        self.search_entry.grid(row=4, column=1, sticky='ew', padx=5, pady=2)
-        ttk.Label(self.filter_frame, text="Искать в:").grid(row=5, column=0, sticky='w')
+        self.search_entry.grid(row=5, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Label(self.filter_frame, text="Искать в:").grid(row=6, column=0, sticky='w')
         self.search_in = ttk.Combobox(self.filter_frame, values=["Событиях", "Мыслях", "Всем тексте"])
         self.search_in.set("Всем тексте")
-        self.search_in.grid(row=5, column=1, sticky='ew', padx=5, pady=2)
+        self.search_in.grid(row=6, column=1, sticky='ew', padx=5, pady=2)
 
         self.apply_btn = ttk.Button(self.filter_frame, text="Применить", command=self._apply_filters)
-        self.apply_btn.grid(row=6, column=0, columnspan=2, pady=5)
+        self.apply_btn.grid(row=7, column=0, columnspan=2, pady=5)
         self.reset_btn = ttk.Button(self.filter_frame, text="Сбросить", command=self._reset_filters)
-        self.reset_btn.grid(row=7, column=0, columnspan=2, pady=5)
-
-        self.tree = ttk.Treeview(self, columns=('date', 'emotion', 'triggers', 'preview'), show='headings', selectmode='browse')
-        self.tree.heading('date', text='Дата')
-        self.tree.heading('emotion', text='Эмоция')
-        self.tree.heading('triggers', text='Триггеры')
-        self.tree.heading('preview', text='Событие')
+        self.reset_btn.grid(row=8, column=0, columnspan=2, pady=5)
+        self._bind_live_filters()
+
+        ttk.Label(self.filter_frame, text="Графики", font=('Arial', 11, 'bold')).grid(row=9, column=0, pady=5, sticky='w')
+        ttk.Label(self.filter_frame, text="Шаг:").grid(row=10, column=0, sticky='w')
+        self.chart_step = ttk.Combobox(self.filter_frame, values=list(CHART_STEPS), state='readonly')
+        self.chart_step.set("Авто")
+        self.chart_step.grid(row=10, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Label(self.filter_frame, text="Сглаживание:").grid(row=11, column=0, sticky='w')
+        self.chart_window = ttk.Combobox(self.filter_frame, values=list(CHART_WINDOWS), state='readonly')
+        self.chart_window.set("Нет")
+        self.chart_window.grid(row=11, column=1, sticky='ew', padx=5, pady=2)
+        for combo in (self.chart_step, self.chart_window):
+            combo.bind('<<ComboboxSelected>>', self._change_chart_view)
+
+        self.table = VirtualTable(
+            self,
+            columns=('date', 'emotion', 'triggers', 'preview'),
+            headings=('Дата', 'Эмоция', 'Триггеры', 'Событие'),
+            get_entry=self.entry_store.get,
+            format_row=self._format_row
+        )
+        self.tree = self.table.tree
 
         self.detail_frame = ttk.Frame(self)
         self.detail_text = scrolledtext.ScrolledText(self.detail_frame, wrap=tk.WORD, width=60, height=10, font=('Arial', 9))
         self.detail_text.config(state='disabled')
         self.detail_text.pack(fill='both', expand=True)
 
-        self.tree.bind("<<TreeviewSelect>>", self._show_entry_details)
+        # add='+': первым выделение обрабатывает сама таблица (запоминает ключ записи)
+        self.tree.bind("<<TreeviewSelect>>", self._show_entry_details, add='+')
 
     def _layout_widgets(self):
         self.filter_container.grid(row=0, column=0, sticky='ns', padx=10, pady=10)
-        self.tree.grid(row=0, column=1, sticky='nsew', padx=10, pady=10)
+        self.table.grid(row=0, column=1, sticky='nsew', padx=10, pady=10)
         self.detail_frame.grid(row=1, column=0, columnspan=2, sticky='nsew', padx=10, pady=10)
         self.grid_rowconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(1, weight=1)
 
     def _setup_charts(self):
+        """Создаёт вкладки и графики один раз; дальше меняются только их данные"""
         self.notebook = ttk.Notebook(self.detail_frame)
         self.notebook.pack(fill='both', expand=True)
 
-        chart_frame1 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame1, text="Эмоции по дням")
-        self._plot_emotion_chart(chart_frame1)
-
-        chart_frame2 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame2, text="Триггеры")
-        self._plot_trigger_chart(chart_frame2)
-
-        chart_frame3 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame3, text="Частые мысли")
-        self._plot_thought_chart(chart_frame3)
-
-        chart_frame4 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame4, text="Интенсивность эмоций")
-        self._plot_intensity_chart(chart_frame4)
-
-    def _plot_emotion_chart(self, parent):
-        from collections import defaultdict
-        import matplotlib.pyplot as plt
-        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-        emotion_by_day = defaultdict(lambda: defaultdict(int))
-
-        for entry in self.entries:
-            try:
-                date = entry.get('timestamp', '')[:10]
-                emotion = entry.get('emotion', '')
-                if date and emotion:
-                    emotion_by_day[date][emotion] += 1
-            except:
-                continue
-
-        if not emotion_by_day:
-            return
-
-        sorted_dates = sorted(emotion_by_day.keys())
-        emotions = sorted(set(e for daily in emotion_by_day.values() for e in daily))
-
-        emotion_counts = {emotion: [] for emotion in emotions}
-        for date in sorted_dates:
-            for emotion in emotions:
-                emotion_counts[emotion].append(emotion_by_day[date].get(emotion, 0))
-
-        fig, ax = plt.subplots(figsize=(8, 4))
-        for emotion, counts in emotion_counts.items():
-            ax.plot(sorted_dates, counts, marker='o', label=emotion)
-
-        ax.set_title("Динамика эмоций")
-        ax.set_xlabel("Дата")
-        ax.set_ylabel("Количество")
-        ax.grid(True)
-        ax.legend()
-
-        canvas = FigureCanvasTkAgg(fig, master=parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-
-    def _plot_trigger_chart(self, parent):
-        from collections import Counter
-        import matplotlib.pyplot as plt
-        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-        all_triggers = [t for e in self.entries for t in e.get('triggers', [])]
-        counter = Counter(all_triggers)
-        top_triggers = counter.most_common(10)
-
-        if not top_triggers:
-            return
-
-        labels = [t[0] for t in top_triggers]
-        counts = [t[1] for t in top_triggers]
-
-        fig, ax = plt.subplots(figsize=(8, 4))
-        ax.barh(labels, counts, color='#4db6ac')
-        ax.set_title("Частые триггеры")
-        ax.set_xlabel("Частота")
-        ax.set_ylabel("Триггеры")
-        ax.invert_yaxis()
-
-        canvas = FigureCanvasTkAgg(fig, master=parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-
-    def _plot_thought_chart(self, parent):
-        from collections import Counter
-        import matplotlib.pyplot as plt
-        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-        all_thoughts = [t for e in self.entries for t in e.get('thoughts', [])]
-        counter = Counter(all_thoughts)
-        top_thoughts = counter.most_common(10)
-
-        if not top_thoughts:
-            return
-
-        labels = [t[0] for t in top_thoughts]
-        counts = [t[1] for t in top_thoughts]
-
-        fig, ax = plt.subplots(figsize=(8, 4))
-        ax.barh(labels, counts, color='#ff8a65')
-        ax.set_title("Частые мысли")
-        ax.set_xlabel("Частота")
-        ax.set_ylabel("Мысли")
-        ax.invert_yaxis()
-
-        canvas = FigureCanvasTkAgg(fig, master=parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-
-    def _plot_intensity_chart(self, parent):
-        from collections import defaultdict
-        import matplotlib.pyplot as plt
-        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-        # Собираем интенсивности по эмоциям и дням
-        intensity_by_day = defaultdict(lambda: defaultdict(list))
-
-        for entry in self.entries:
-            date = entry.get('timestamp', '')[:10]
-            emotion = entry.get('emotion', '')
-            intensity = entry.get('intensity', 0)
-            if emotion and intensity > 0:
-                intensity_by_day[emotion][date].append(intensity)
-
-        if not intensity_by_day:
-            return
-
-        fig, ax = plt.subplots(figsize=(8, 4))
-
-        for emotion, dates in intensity_by_day.items():
-            sorted_dates = sorted(dates)
-            avg_values = [sum(dates[d]) / len(dates[d]) for d in sorted_dates]
-            ax.plot(sorted_dates, avg_values, marker='o', label=emotion)
-
-            # Добавим подписи к точкам
-            for i, val in enumerate(avg_values):
-                ax.annotate(f"{val:.1f}", (sorted_dates[i], val), textcoords="offset points", xytext=(0, 5),
-                            ha='center')
-
-        ax.set_title("Интенсивность эмоций по дням")
-        ax.set_xlabel("Дата")
-        ax.set_ylabel("Средняя интенсивность (0–10)")
-        ax.set_ylim(0, 10)
-        ax.grid(True)
-        ax.legend()
-
-        canvas = FigureCanvasTkAgg(fig, master=parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.charts = diary_charts()
+        for title, chart in self.charts:
+            chart_frame = ttk.Frame(self.notebook)
+            self.notebook.add(chart_frame, text=title)
+            chart.attach(chart_frame)
+
+        # Рисуется только открытая вкладка; остальные — при переключении на них.
+        # Пока сам дневник скрыт, графики лишь помечаются устаревшими и рисуются при показе
+        self.notebook.bind('<<NotebookTabChanged>>', self._render_current_chart)
+        self.bind('<Map>', self._render_current_chart, add='+')
+        self._update_charts(self.entries)
+
+    def destroy(self):
+        # Фигуры освобождаем явно: холсты держат ссылки на них и на буферы отрисовки
+        for _, chart in getattr(self, 'charts', []):
+            chart.close()
+        self.charts = []
+        super().destroy()
 
     def _get_unique_emotions(self):
-        return list(set(
-            e.get('emotion', '') for e in self.entries
-            if e.get('emotion')
-        ))
-
-    def _apply_filters(self):
-        filtered = self.entries.copy()
-
-        # Фильтр по эмоции
-        emotion = self.emotion_filter.get()
-        if emotion:
-            filtered = [e for e in filtered if e.get('emotion') == emotion]
+        return list(self.emotion_counts)
 
-        # Фильтр по датам
+    def _read_filters(self):
+        """Текущие значения полей фильтра"""
+        date_f = date_t = None
         try:
             if self.date_from.get():
                 date_f = datetime.strptime(self.date_from.get(), '%Y-%m-%d').date()
-                filtered = [e for e in filtered if datetime.strptime(e['timestamp'], '%Y-%m-%d %H:%M').date() >= date_f]
-
             if self.date_to.get():
                 date_t = datetime.strptime(self.date_to.get(), '%Y-%m-%d').date()
-                filtered = [e for e in filtered if datetime.strptime(e['timestamp'], '%Y-%m-%d %H:%M').date() <= date_t]
         except ValueError:
             pass
 
+        return {
+            'emotion': self.emotion_filter.get(),
+            'trigger': self.trigger_filter.get(),
+            'date_from': date_f,
+            'date_to': date_t,
+            'search_text': self.search_entry.get().lower(),
+            'search_in': self.search_in.get()
+        }
+
+    def _passes_filters(self, entry, filters):
+        """Проверяет одну запись по фильтрам (та же логика, что и у полного применения)"""
+        if not filters:
+            return True
+
+        # Фильтр по эмоции
+        if filters['emotion'] and entry.get('emotion') != filters['emotion']:
+            return False
+
+        # Фильтр по триггеру
+        if filters['trigger'] and filters['trigger'] not in entry.get('triggers', []):
+            return False
+
+        # Фильтр по датам
+        if filters['date_from'] or filters['date_to']:
+            try:
+                entry_date = datetime.strptime(entry['timestamp'], '%Y-%m-%d %H:%M').date()
+            except (KeyError, ValueError):
+                entry_date = None
+            if entry_date:
+                if filters['date_from'] and entry_date < filters['date_from']:
+                    return False
+                if filters['date_to'] and entry_date > filters['date_to']:
+                    return False
+
         # Фильтр по тексту
-        search_text = self.search_entry.get().lower()
-        if search_text:
-            search_in = self.search_in.get()
-            filtered = [e for e in filtered if self._matches_search(e, search_text, search_in)]
+        if filters['search_text']:
+            return self._matches_search(entry, filters['search_text'], filters['search_in'])
+        return True
+
+    def _diary_index(self):
+        if self._index_stale:
+            self.index.build(self.entries)
+            self._index_stale = False
+        return self.index
+
+    def _bind_live_filters(self):
+        """Фильтр применяется сам, когда пользователь перестаёт печатать или выбирает значение"""
+        for widget in (self.search_entry, self.emotion_filter, self.trigger_filter, self.date_from, self.date_to):
+            widget.bind('<KeyRelease>', self._schedule_filter, add='+')
+        for widget in (self.emotion_filter, self.trigger_filter, self.search_in):
+            widget.bind('<<ComboboxSelected>>', self._schedule_filter, add='+')
+        for widget in (self.date_from, self.date_to):
+            widget.bind('<<DateEntrySelected>>', self._schedule_filter, add='+')
+
+    def _schedule_filter(self, event=None):
+        """Откладывает фильтр до паузы во вводе; новый ввод отменяет и ожидающий, и не дорисованный проход"""
+        self._filter_generation += 1
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DEBOUNCE_MS, self._run_live_filter)
+
+    def _run_live_filter(self):
+        self._filter_job = None
+        # Клавиши без изменения значений (стрелки, Tab) не перезапускают фильтр
+        if self._read_filters() == self._applied_filters and not self._index_stale:
+            # Графики, пропущенные из-за этого ввода, всё же дорисовываем
+            self._render_current_chart()
+            return
+        self._apply_filters()
 
-        self._update_display(filtered)
+    def _apply_filters(self):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+            self._filter_job = None
+        self._filter_generation += 1
+
+        with self.filter_timer.measure():
+            filters = self._read_filters()
+            self._applied_filters = filters
+
+            # Эмоция, триггер, даты и текст — срезы и пересечения по колонкам индекса
+            keys = self._diary_index().query(**filters)
+            self._update_display(keys)
 
     def _matches_search(self, entry, text, search_in):
-        """Проверяет совпадение текста в записи"""
-        if search_in == "Событиях":
-            return text in entry.get('text', '').lower()
-        elif search_in == "Мыслях":
-            return any(text in thought.lower() for thought in entry.get('thoughts', []))
-        else:  # Весь текст
-            return (
-                    text in entry.get('text', '').lower() or
-                    any(text in thought.lower() for thought in entry.get('thoughts', []))
-            )
+        """Проверяет совпадение текста в записи (по словам, как и поиск по индексу)"""
+        return entry_matches(entry, text, search_in)
 
     def _reset_filters(self):
         """Сбрасывает все фильтры"""
         self.emotion_filter.set('')
+        self.trigger_filter.set('')
         self.date_from.delete(0, tk.END)
         self.date_to.delete(0, tk.END)
         self.search_entry.delete(0, tk.END)
@@ -481,15 +586,7 @@ class DiaryView(tk.Frame):
 
     def _show_entry_details(self, event=None):
         """Показывает подробности выбранной записи"""
-        selected = self.tree.focus()
-        if not selected:
-            return
-
-        values = self.tree.item(selected, 'values')
-        timestamp = values[0]
-
-        # Ищем запись по времени
-        entry = next((e for e in self.entries if e.get('timestamp') == timestamp), None)
+        entry = self.table.selected_entry()
         if not entry:
             return
 
@@ -518,50 +615,58 @@ class DiaryView(tk.Frame):
 
     def _load_entries(self):
         """Загружает записи в таблицу"""
-        self.tree.delete(*self.tree.get_children())
-
-        sorted_entries = sorted(self.entries, key=lambda e: e.get('timestamp', ''), reverse=True)
-
-        for entry in sorted_entries:
-            timestamp = entry.get('timestamp', '')
-            emotion = entry.get('emotion', '')
-            triggers = ', '.join(entry.get('triggers', []))
-            preview = ' '.join(entry.get('text', '').split()[:5]) + '...' if entry.get('text') else ''
-
-            self.tree.insert('', 'end', values=(timestamp, emotion, triggers, preview))
-
-    def _update_display(self, entries):
-        """Обновляет отображение таблицы и графиков"""
-        self.tree.delete(*self.tree.get_children())
-
-        for entry in sorted(entries, key=lambda e: e.get('timestamp', ''), reverse=True):
-            timestamp = entry.get('timestamp', '')
-            emotion = entry.get('emotion', '')
-            triggers = ', '.join(entry.get('triggers', []))
-            preview = ' '.join(entry.get('text', '').split()[:5]) + '...' if entry.get('text') else ''
-
-            self.tree.insert('', 'end', values=(timestamp, emotion, triggers, preview))
-
-        # Обновим графики
-        self._update_charts(entries)
-
-    def _update_charts(self, entries):
-        """Обновляет графики на основе отфильтрованных данных"""
-        for tab in self.notebook.tabs():
-            self.notebook.forget(tab)
-
-        chart_frame1 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame1, text="Эмоции по дням")
-        self._plot_emotion_chart(chart_frame1)
-
-        chart_frame2 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame2, text="Триггеры")
-        self._plot_trigger_chart(chart_frame2)
-
-        chart_frame3 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame3, text="Частые мысли")
-        self._plot_thought_chart(chart_frame3)
-
-        chart_frame4 = ttk.Frame(self.notebook)
-        self.notebook.add(chart_frame4, text="Интенсивность эмоций")
-        self._plot_intensity_chart(chart_frame4)
+        self._show_entries(self.entries)
+
+    def _update_display(self, keys):
+        """Обновляет отображение таблицы и графиков; keys — ключи записей, новые сверху"""
+        self.table.set_keys(keys)
+
+        # Обновим графики (по строкам таблицы) — отдельным шагом после отрисовки таблицы
+        self._update_charts(defer=True)
+
+    def _update_charts(self, entries=None, defer=False):
+        """Помечает графики устаревшими и перерисовывает только открытую вкладку.
+
+        entries=None — записи, которые сейчас в таблице. defer — отрисовать, когда Tk освободится;
+        если к тому времени пришёл новый ввод, этот проход уже устарел и не рисуется.
+        """
+        self._chart_entries = entries
+        for _, chart in self.charts:
+            chart.dirty = True
+        if defer:
+            generation = self._filter_generation
+            self.after_idle(lambda: self._render_current_chart(generation=generation))
+        else:
+            self._render_current_chart()
+
+    def _change_chart_view(self, event=None):
+        """Новый шаг или окно: ряды пересчитываются из тех же агрегатов, без прохода по записям"""
+        frequency = CHART_STEPS[self.chart_step.get()]
+        window = CHART_WINDOWS[self.chart_window.get()]
+        for _, chart in self.charts:
+            if hasattr(chart, 'set_view'):
+                chart.set_view(frequency, window)
+        self._render_current_chart()
+
+    def _chart_state(self):
+        """Ключ кэша агрегатов: версия данных + применённый фильтр"""
+        return self._data_version, tuple(sorted(self._applied_filters.items()))
+
+    def _current_chart_entries(self):
+        if self._chart_entries is not None:
+            return self._chart_entries
+        return [self.entry_store[key] for key in self.table.keys]
+
+    def _render_current_chart(self, event=None, generation=None):
+        if generation is not None and generation != self._filter_generation:
+            return
+        if not self.winfo_ismapped():
+            return
+        try:
+            index = self.notebook.index('current')
+        except tk.TclError:
+            return
+        _, chart = self.charts[index]
+        if chart.dirty:
+            with self.chart_timer.measure():
+                chart.render(self.aggregation.get(self._chart_state(), self._current_chart_entries))
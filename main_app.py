@@ -1,3 +1,4 @@
+from timing import get_timer, mark_startup  # первым импортом: отсчёт времени запуска
 from tkinter import scrolledtext
 from datetime import datetime
 import json
@@ -6,8 +7,19 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from interface import JournalEntryForm, DiaryView
 from analyzer import EmotionAnalyzer
+from model_loader import resolve_model_path
+from prediction_cache import PredictionCache
+from storage import JournalLog
+from repository import JournalRepository
 from data_models import LongTermAnalysis, JournalEntry
 from collections import defaultdict
+from workers import BackgroundPipeline
+
+# Сколько миллисекунд главный поток может тратить на один шаг обработки записи
+UI_BUDGET_MS = 50
+
+# На машинах с малым объёмом памяти — сжатая модель (train_model.py --quantize)
+PREFER_QUANTIZED_MODEL = False
 
 class MentalHealthApp:
     def __init__(self, root):
@@ -17,7 +29,19 @@ class MentalHealthApp:
         self.root.configure(bg='#e0f7fa')
 
         self.entries = []  # Инициализация списка записей
-        self.analyzer = EmotionAnalyzer()
+        self.journal = JournalRepository('data/journal.db')
+        # Однократный перенос из прежних форматов (JSONL-журнал или journal_entries.json)
+        self.journal.migrate_from(JournalLog('data/journal_entries.jsonl', legacy_path='data/journal_entries.json'))
+        self.analyzer = EmotionAnalyzer(
+            resolve_model_path("model/emotion_model.bin", PREFER_QUANTIZED_MODEL),
+            # Кэш предсказаний переживает перезапуск, пока не сменится модель
+            prediction_cache=PredictionCache(path="model/prediction_cache.json")
+        )
+        self.analyzer.model_loader.on_ready(lambda model: mark_startup("Запуск: модель готова"))
+
+        # Анализ и сохранение — в фоне; время работы главного потока на одну запись под контролем
+        self.pipeline = BackgroundPipeline(self.root)
+        self.ui_timer = get_timer("UI-поток: обработка записи", budget_ms=UI_BUDGET_MS)
 
         self._setup_styles()
         self._setup_ui()
@@ -31,6 +55,24 @@ class MentalHealthApp:
         self.status_label = ttk.Label(self.root, textvariable=self.status_var, foreground='green', font=('Arial', 10))
         self.status_label.pack(side='bottom', pady=5)
 
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        self._window_shown = False
+        self.root.bind('<Map>', self._on_first_map, add='+')
+
+    def _on_first_map(self, event):
+        if event.widget is self.root and not self._window_shown:
+            self._window_shown = True
+            mark_startup("Запуск: окно на экране")
+
+    def _on_close(self):
+        # Сначала доделываются запись и сохранение в фоне, и только потом закрывается база:
+        # иначе запись, отправленная перед закрытием окна, потеряется
+        self.pipeline.shutdown(wait=True)
+        self.analyzer.prediction_cache.save()
+        self.journal.close()
+        self.root.destroy()
+
     def _setup_education_tab(self):
         self.tab_edu = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_edu, text="Обо мне")
@@ -112,14 +154,12 @@ class MentalHealthApp:
     def _load_initial_data(self):
         """Загружает начальные данные при запуске"""
         try:
-            if os.path.exists(r'D:/Software/Necessary/Dippploom/KOOOOD/MentalHealthApp/data/journal_entries.json'):
-                with open(r'D:/Software/Necessary/Dippploom/KOOOOD/MentalHealthApp/data/journal_entries.json', "r", encoding="utf-8") as f:
-                    self.entries = json.load(f)
-
-                # 👇 Загружаем записи в EmotionAnalyzer
-                self.analyzer.entries = [
-                    JournalEntry(**entry) for entry in self.entries if isinstance(entry, dict)
-                ]
+            # Записи читаются из хранилища один раз, страницами, от старых к новым.
+            # Анализатор и дневник держат списки ссылок на одни и те же словари;
+            # дневник дописывает новые в конец, порядок строк (новые сверху) задаёт таблица
+            history = [entry for entry in self.journal.iter_entries() if isinstance(entry, dict)]
+            self.analyzer.entries = history
+            self.entries = history
         except Exception as e:
             print(f"Ошибка загрузки: {e}")
             self.entries = []
@@ -129,81 +169,99 @@ class MentalHealthApp:
         self.tab_diary = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_diary, text="Дневник")
 
-        # Нормализация структуры записей
-        normalized_entries = []
+        # Недостающие поля дописываются в сами записи, без копии всего дневника
+        now = datetime.now().strftime('%Y-%m-%d %H:%M')
         for entry in self.entries:
-            if isinstance(entry, dict):
-                normalized = {
-                    'timestamp': entry.get('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M')),
-                    'text': entry.get('text', ''),
-                    'triggers': entry.get('triggers', []),
-                    'physical_sensations': entry.get('physical_sensations', []),
-                    'thoughts': entry.get('thoughts', []),
-                    'emotion': entry.get('emotion', '')
-                }
-                normalized_entries.append(normalized)
-
-        self.diary_view = DiaryView(self.tab_diary, normalized_entries)
+            entry.setdefault('id', None)
+            entry.setdefault('timestamp', now)
+            entry.setdefault('text', '')
+            for field in ('triggers', 'physical_sensations', 'thoughts'):
+                entry.setdefault(field, [])
+            entry.setdefault('emotion', '')
+
+        self.diary_view = DiaryView(self.tab_diary, self.entries)
         self.diary_view.pack(fill='both', expand=True)
 
-    def _save_entries(self):
-        """Сохраняет записи в файл"""
+    def _process_journal_entry(self, entry_data):
+        """Отправляет запись на анализ в фоновый поток; окно при этом не замирает"""
+        with self.ui_timer.measure():
+            self.entry_form.set_processing(True)
+            self.pipeline.submit(
+                self._analyze_and_save, entry_data,
+                on_done=self._on_entry_processed,
+                on_error=self._on_entry_failed
+            )
+
+    def _analyze_and_save(self, entry_data):
+        """Выполняется в рабочем потоке: анализ моделью и сохранение в хранилище"""
+        # id назначается здесь, а не в главном потоке: new_id ждёт блокировку хранилища,
+        # которую держит идущее сохранение. По id запись найдут анализатор, хранилище и дневник
+        entry_data['id'] = self.journal.new_id()
+        analysis = self.analyzer.analyze_entry(entry_data, record=False)
+        if not analysis:
+            return None, None, None
+
+        # Создаем полную запись
+        new_entry = {
+            'id': entry_data['id'],
+            'timestamp': entry_data['timestamp'],
+            'text': entry_data['text'],
+            'triggers': entry_data['triggers'],
+            'physical_sensations': entry_data['physical_sensations'],
+            'thoughts': entry_data['thoughts'],
+            'emotion': analysis.manifested_emotion,
+            'intensity': getattr(analysis, 'intensity', 0),
+            'recommendation': analysis.recommendation,
+            'model_version': self.analyzer.model_loader.version
+        }
+
+        # Ошибку сохранения показываем уже в главном потоке
+        save_error = None
         try:
-            os.makedirs('data', exist_ok=True)
-            with open('data/journal_entries.json', 'w', encoding='utf-8') as f:
-                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            self.journal.append(new_entry)
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить записи: {str(e)}")
+            save_error = str(e)
+        # Тот же словарь — в историю анализатора и (в главном потоке) в дневник
+        self.analyzer.record_entry(new_entry)
 
-    def _process_journal_entry(self, entry_data):
-        """Обрабатывает новую запись без переключения вкладки"""
-        try:
-            analysis = self.analyzer.analyze_entry(entry_data)
-            if analysis:
-                # Показываем анализ в текущей вкладке
-                self.entry_form.show_analysis(analysis)
-
-                # Создаем полную запись
-                new_entry = {
-                    'timestamp': entry_data['timestamp'],
-                    'text': entry_data['text'],
-                    'triggers': entry_data['triggers'],
-                    'physical_sensations': entry_data['physical_sensations'],
-                    'thoughts': entry_data['thoughts'],
-                    'emotion': analysis.manifested_emotion,
-                    'intensity': getattr(analysis, 'intensity', 0),
-                    'recommendation': analysis.recommendation
-                }
-
-                # Добавляем запись
-                self.entries.insert(0, new_entry)
-
-                # Сохраняем и обновляем дневник (без переключения вкладки)
-                self._save_entries()
-                self._update_diary()
-
-                # Показываем уведомление о успешном добавлении
-                messagebox.showinfo("Готово", "Запись успешно добавлена в дневник")
-                # В _process_journal_entry после успешного добавления
-                self.status_var.set("Запись добавлена в дневник")
-                self.root.after(3000, lambda: self.status_var.set(""))
-
-                self.status_var.set("Ты молодец, что следишь за собой 💚")
-                self.root.after(3000, lambda: self.status_var.set(""))
+        return analysis, new_entry, save_error
 
+    def _on_entry_processed(self, result):
+        """Главный поток: показывает результат анализа без переключения вкладки"""
+        analysis, new_entry, save_error = result
 
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось проанализировать запись: {str(e)}")
-
-    def _update_diary(self):
-        """Обновляет дневник в фоновом режиме"""
-        if hasattr(self, 'diary_view') and self.diary_view.winfo_exists():
-            try:
-                # Обновляем только если вкладка видима
-                if self.notebook.tab(self.tab_diary, 'state') == 'normal':
-                    self.diary_view.update_entries(self.entries)
-            except Exception as e:
-                print(f"Фоновое обновление дневника: {e}")
+        with self.ui_timer.measure():
+            self.entry_form.set_processing(False)
+            if not analysis:
+                return
+
+            # Показываем анализ в текущей вкладке
+            self.entry_form.show_analysis(analysis)
+
+        # Обновление дневника — отдельным шагом, чтобы анализ появился на экране сразу;
+        # запись в общий список self.entries добавит сам дневник (apply_changes)
+        self.root.after_idle(lambda: self._refresh_after_entry(new_entry))
+
+        if save_error:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить запись: {save_error}")
+            return
+
+        # Показываем уведомление о успешном добавлении
+        messagebox.showinfo("Готово", "Запись успешно добавлена в дневник")
+        # В _process_journal_entry после успешного добавления
+        self.status_var.set("Запись добавлена в дневник")
+        self.root.after(3000, lambda: self.status_var.set(""))
+
+        self.status_var.set("Ты молодец, что следишь за собой 💚")
+        self.root.after(3000, lambda: self.status_var.set(""))
+
+    def _refresh_after_entry(self, new_entry):
+        with self.ui_timer.measure():
+            self._update_diary(added=[new_entry])
+
+    def _on_entry_failed(self, error):
+        self.entry_form.set_processing(False)
+        messagebox.showerror("Ошибка", f"Не удалось проанализировать запись: {str(error)}")
 
     def _setup_summary_tab(self):
         """Создает вкладку с общим анализом"""
@@ -293,9 +351,13 @@ class MentalHealthApp:
         self.summary_text.insert(tk.END, summary)
         self.summary_text.config(state='disabled')
 
-    def _update_diary(self):
+    def _update_diary(self, added=None):
         if hasattr(self, 'diary_view'):
-            self.diary_view.update_entries(self.entries)
+            if added is not None:
+                # Новая запись — точечная вставка строки, без перестройки всей таблицы
+                self.diary_view.apply_changes(added=added)
+            else:
+                self.diary_view.update_entries(self.entries)
         self._update_summary()  # Обновляем сводку
 
 
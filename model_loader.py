@@ -0,0 +1,97 @@
+# model_loader.py - Фоновая загрузка FastText-модели
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import fasttext
+
+from prediction_cache import model_fingerprint
+
+
+def resolve_model_path(path="model/emotion_model.bin", prefer_quantized=False):
+    """Выбирает между полной (.bin) и сжатой (.ftz) моделью, лежащими рядом"""
+    quantized = os.path.splitext(path)[0] + ".ftz"
+    if prefer_quantized and os.path.exists(quantized):
+        return quantized
+    if not os.path.exists(path) and os.path.exists(quantized):
+        return quantized
+    return path
+
+
+def model_version(path):
+    """Версия модели — начало SHA-256 файла: одинаковые модели дают одну версию при любом имени.
+
+    Ею помечаются размеченные записи (model_version в хранилище), по ней backfill.py
+    понимает, какие записи уже размечены этой моделью.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class ModelLoader:
+    """Загружает модель в отдельном потоке; get() ждёт готовности только тогда, когда модель нужна"""
+
+    def __init__(self, path="model/emotion_model.bin"):
+        self.path = path
+        self.load_seconds = None
+        # Отпечаток файла на момент загрузки: по нему кэш предсказаний узнаёт смену модели
+        self.fingerprint = None
+        # Версия загруженной модели (model_version); None — модели нет
+        self.version = None
+        self._future = Future()
+        self._started = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_model(cls, model, path=None):
+        """Обёртка над уже загруженной моделью (тесты, замеры, общая модель)"""
+        loader = cls(path)
+        loader._started = True
+        loader.load_seconds = 0.0
+        loader.fingerprint = model_fingerprint(path) or f"model-{id(model)}"
+        if model is not None and path and os.path.exists(path):
+            loader.version = model_version(path)
+        loader._future.set_result(model)
+        return loader
+
+    def start(self):
+        """Запускает загрузку в фоне (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._started:
+                return self._future
+            self._started = True
+        threading.Thread(target=self._load, name="model-loader", daemon=True).start()
+        return self._future
+
+    def _load(self):
+        start = time.perf_counter()
+        model = None
+        self.fingerprint = model_fingerprint(self.path)
+        try:
+            # ЗАГРУЖАЕМ FastText-МОДЕЛЬ
+            model = fasttext.load_model(self.path)
+            self.version = model_version(self.path)
+        except Exception as e:
+            print(f"[ОШИБКА] Не удалось загрузить модель: {str(e)}")
+            print(f"Убедитесь, что файл {self.path} существует")
+        self.load_seconds = time.perf_counter() - start
+        self._future.set_result(model)
+
+    def get(self, timeout=None):
+        """Модель (или None, если загрузить не удалось); при необходимости ждёт загрузку"""
+        if not self._started:
+            self.start()
+        return self._future.result(timeout)
+
+    @property
+    def ready(self):
+        return self._future.done()
+
+    def on_ready(self, callback):
+        """callback(model) вызывается после загрузки — в потоке загрузчика"""
+        self._future.add_done_callback(lambda future: callback(future.result()))
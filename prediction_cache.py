@@ -0,0 +1,146 @@
+# prediction_cache.py - Кэш предсказаний модели по нормализованному тексту
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Ключ кэша и вход модели: нижний регистр, пробелы и переводы строк схлопнуты.
+
+    Обучающая выборка (data/emotions.txt) в нижнем регистре, а FastText предсказывает
+    построчно, поэтому модель получает тот же текст, что и ключ, и ответ кэша точен.
+    """
+    return " ".join(text.lower().split())
+
+
+def model_fingerprint(path):
+    """Отпечаток файла модели: имя, размер и время изменения (None — файла нет)"""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class PredictionCache:
+    """LRU предсказаний: (отпечаток модели, нормализованный текст, k, порог) -> метки и вероятности.
+
+    Отпечаток берётся у загруженной модели (ModelLoader.fingerprint): когда подгружается
+    новый emotion_model.bin, отпечаток меняется и кэш очищается сам. С path кэш
+    сохраняется на диск (save) и при следующем запуске подхватывается, только если
+    отпечаток модели тот же.
+    """
+
+    def __init__(self, max_size=20000, path=None):
+        self.max_size = max_size
+        self.path = path
+        self.fingerprint = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bind(self, fingerprint):
+        """Привязывает кэш к модели; при смене модели старые предсказания отбрасываются"""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            if self._items:
+                self.invalidations += 1
+            self._items.clear()
+            self.fingerprint = fingerprint
+            self._load()
+
+    def predict(self, model, texts, k=1, threshold=0.0):
+        """Как model.predict для списка текстов, но повторные тексты берутся из кэша.
+
+        Возвращает список пар (метки, вероятности) в порядке texts; тексты должны быть
+        уже нормализованы (normalize_text). Каждый разный текст пакета смотрится в кэше
+        один раз, промахи уходят в модель одним вызовом predict.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                key = (text, k, threshold)
+                cached = self._items.get(key)
+                if cached is None:
+                    missing.append(text)
+                else:
+                    self._items.move_to_end(key)
+                    found[text] = cached
+            self.misses += len(missing)
+            # Повторы внутри пакета модель не видит — это тоже попадания
+            self.hits += len(texts) - len(missing)
+
+        if missing:
+            labels, probs = model.predict(missing, k=k, threshold=threshold)
+            with self._lock:
+                for text, text_labels, text_probs in zip(missing, labels, probs):
+                    prediction = (tuple(text_labels), tuple(text_probs.tolist()))
+                    found[text] = prediction
+                    self._items[(text, k, threshold)] = prediction
+                while len(self._items) > self.max_size:
+                    self._items.popitem(last=False)
+        return [found[text] for text in texts]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def hit_rate(self):
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "invalidations": self.invalidations,
+        }
+
+    # --- Диск ---
+
+    def save(self):
+        """Сохраняет кэш в path (через временный файл, чтобы не оставить его недописанным)"""
+        if not self.path or self.fingerprint is None:
+            return
+        with self._lock:
+            data = {
+                "fingerprint": self.fingerprint,
+                "items": [[text, k, threshold, list(labels), list(probs)]
+                          for (text, k, threshold), (labels, probs) in self._items.items()]
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить кэш предсказаний: {e}")
+
+    def _load(self):
+        if not self.path or self.fingerprint is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Кэш предсказаний не прочитан: {e}")
+            return
+        # Кэш от другой модели не подходит
+        if data.get("fingerprint") != self.fingerprint:
+            return
+        for text, k, threshold, labels, probs in data.get("items", [])[-self.max_size:]:
+            self._items[(text, k, threshold)] = (tuple(labels), tuple(probs))
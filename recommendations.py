@@ -0,0 +1,105 @@
+# recommendations.py - Кэш рекомендаций по эмоциям
+import json
+import os
+import threading
+import time
+
+
+DEFAULT_RECOMMENDATION = {
+    "short_term": ["Рекомендации не найдены"],
+    "scientific_references": [],
+    "about": {
+        "description": "Описание недоступно",
+        "causes": []
+    }
+}
+
+
+class RecommendationStore:
+    """Держит data/recommendations.json в памяти и перечитывает его только при изменении файла.
+
+    Один объект делят анализаторы разных потоков (сервер, пользователи, фоновый анализ),
+    поэтому счётчики и перечитывание файла — под блокировкой.
+    """
+
+    def __init__(self, path="data/recommendations.json", check_interval=2.0):
+        self.path = path
+        # Как часто (в секундах) проверять mtime/размер файла; 0 — при каждом запросе
+        self.check_interval = check_interval
+
+        self._index = {}
+        self._signature = None
+        self._last_check = None
+        self._last_error = None
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+
+    def get(self, emotion):
+        """Возвращает рекомендации для эмоции или рекомендации по умолчанию"""
+        with self._lock:
+            self._refresh_if_needed()
+
+            result = self._index.get((emotion or "").lower())
+            if result is None:
+                self.misses += 1
+                return DEFAULT_RECOMMENDATION
+            self.hits += 1
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "emotions": len(self._index)
+            }
+
+    def invalidate(self):
+        """Принудительно перечитать файл при следующем запросе"""
+        with self._lock:
+            self._signature = None
+            self._last_check = None
+
+    def _refresh_if_needed(self):
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        try:
+            st = os.stat(self.path)
+        except OSError as e:
+            self._index = {}
+            self._signature = None
+            self._report_error(e)
+            return
+
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = f.read().lstrip('\ufeff')  # удаляем BOM
+            recommendations = json.loads(raw)
+        except Exception as e:
+            self._index = {}
+            self._signature = None
+            self._report_error(e)
+            return
+
+        self._index = {str(k).lower(): v for k, v in recommendations.items()}
+        self._signature = signature
+        self._last_error = None
+        self.reloads += 1
+
+    def _report_error(self, error):
+        # Не засоряем консоль одной и той же ошибкой на каждой записи
+        message = str(error)
+        if message != self._last_error:
+            print("Ошибка загрузки рекомендаций:", error)
+            self._last_error = message
@@ -0,0 +1,355 @@
+# repository.py - Хранилище дневника на SQLite (схема из data_models.py)
+import json
+import os
+import sqlite3
+import threading
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL DEFAULT '',
+    email TEXT UNIQUE,
+    registration_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS journal_entries (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    timestamp TEXT NOT NULL,
+    situation_text TEXT NOT NULL,
+    primary_emotion TEXT NOT NULL DEFAULT '',
+    emotion_intensity INTEGER NOT NULL DEFAULT 0,
+    emotion_probability REAL,
+    thoughts_text TEXT NOT NULL DEFAULT '[]',
+    physical_sensations_text TEXT NOT NULL DEFAULT '[]',
+    triggers_text TEXT NOT NULL DEFAULT '[]',
+    recommendations_json TEXT,
+    model_version TEXT
+);
+
+CREATE TABLE IF NOT EXISTS triggers (
+    id INTEGER PRIMARY KEY,
+    entry_id INTEGER NOT NULL REFERENCES journal_entries(id) ON DELETE CASCADE,
+    trigger_text TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS physical_sensations (
+    id INTEGER PRIMARY KEY,
+    entry_id INTEGER NOT NULL REFERENCES journal_entries(id) ON DELETE CASCADE,
+    sensation_text TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS automatic_thoughts (
+    id INTEGER PRIMARY KEY,
+    entry_id INTEGER NOT NULL REFERENCES journal_entries(id) ON DELETE CASCADE,
+    thought_text TEXT NOT NULL
+);
+
+-- Докуда дошла переразметка истории моделью данной версии (backfill.py)
+CREATE TABLE IF NOT EXISTS relabel_progress (
+    model_version TEXT PRIMARY KEY,
+    last_entry_id INTEGER NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_analysis_history (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    analysis_timestamp TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    analysis_details TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_entries_user_timestamp ON journal_entries(user_id, timestamp);
+-- Фильтры дневника выполняет индекс в памяти (diary_index.py); прежние индексы фильтров не нужны
+DROP INDEX IF EXISTS idx_entries_user_emotion;
+DROP INDEX IF EXISTS idx_triggers_text;
+CREATE INDEX IF NOT EXISTS idx_triggers_entry ON triggers(entry_id);
+CREATE INDEX IF NOT EXISTS idx_sensations_entry ON physical_sensations(entry_id);
+CREATE INDEX IF NOT EXISTS idx_thoughts_entry ON automatic_thoughts(entry_id);
+CREATE INDEX IF NOT EXISTS idx_history_user ON user_analysis_history(user_id, analysis_timestamp);
+"""
+
+# Тексты запросов неизменны, поэтому sqlite3 держит их скомпилированными в кэше соединения
+ENTRY_COLUMNS = """id, timestamp, situation_text, primary_emotion, emotion_intensity,
+    triggers_text, physical_sensations_text, thoughts_text, recommendations_json, model_version"""
+
+INSERT_ENTRY = """INSERT INTO journal_entries (id, user_id, timestamp, situation_text, primary_emotion,
+    emotion_intensity, triggers_text, physical_sensations_text, thoughts_text, recommendations_json, model_version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+UPDATE_ENTRY = """UPDATE journal_entries SET timestamp = ?, situation_text = ?, primary_emotion = ?,
+    emotion_intensity = ?, triggers_text = ?, physical_sensations_text = ?, thoughts_text = ?,
+    recommendations_json = ? WHERE id = ? AND user_id = ?"""
+DELETE_ENTRY = "DELETE FROM journal_entries WHERE id = ? AND user_id = ?"
+INSERT_TRIGGER = "INSERT INTO triggers (entry_id, trigger_text) VALUES (?, ?)"
+INSERT_SENSATION = "INSERT INTO physical_sensations (entry_id, sensation_text) VALUES (?, ?)"
+INSERT_THOUGHT = "INSERT INTO automatic_thoughts (entry_id, thought_text) VALUES (?, ?)"
+DELETE_TRIGGERS = "DELETE FROM triggers WHERE entry_id = ?"
+DELETE_SENSATIONS = "DELETE FROM physical_sensations WHERE entry_id = ?"
+DELETE_THOUGHTS = "DELETE FROM automatic_thoughts WHERE entry_id = ?"
+SELECT_ALL = f"SELECT {ENTRY_COLUMNS} FROM journal_entries WHERE user_id = ? ORDER BY timestamp, id"
+# Постраничное чтение по ключу (timestamp, id): страница продолжает предыдущую без OFFSET
+SELECT_PAGE = f"""SELECT {ENTRY_COLUMNS} FROM journal_entries WHERE user_id = ? AND (timestamp, id) > (?, ?)
+    ORDER BY timestamp, id LIMIT ?"""
+NEXT_ID = "SELECT COALESCE(MAX(id), 0) + 1 FROM journal_entries"
+COUNT_ENTRIES = "SELECT COUNT(*) FROM journal_entries WHERE user_id = ?"
+INSERT_HISTORY = "INSERT INTO user_analysis_history (user_id, analysis_details) VALUES (?, ?)"
+# Переразметка идёт по всем пользователям в порядке id
+# Записи, уже размеченные пропускаемой версией модели, не выбираются (NULL IS NOT 'x' — истина);
+# :skip = NULL — выбираются все
+SKIP_VERSION = "(:skip IS NULL OR model_version IS NOT :skip)"
+SELECT_TEXTS = f"""SELECT id, situation_text FROM journal_entries WHERE id > :after AND {SKIP_VERSION}
+    ORDER BY id LIMIT :limit"""
+COUNT_AFTER = f"SELECT COUNT(*) FROM journal_entries WHERE id > :after AND {SKIP_VERSION}"
+RELABEL_ENTRY = """UPDATE journal_entries SET primary_emotion = ?, emotion_intensity = ?, recommendations_json = ?,
+    model_version = ? WHERE id = ?"""
+SELECT_PROGRESS = "SELECT last_entry_id FROM relabel_progress WHERE model_version = ?"
+SAVE_PROGRESS = """INSERT INTO relabel_progress (model_version, last_entry_id) VALUES (?, ?)
+    ON CONFLICT(model_version) DO UPDATE SET last_entry_id = excluded.last_entry_id, updated_at = CURRENT_TIMESTAMP"""
+
+
+class JournalRepository:
+    """Записи дневника в SQLite (WAL); постраничное чтение по индексу (пользователь, дата).
+
+    Фильтры дневника выполняются в памяти (diary_index.DiaryIndex), не запросами к базе.
+    Списки триггеров/ощущений/мыслей хранятся и JSON-полем в самой записи (быстрая сборка
+    записи), и строками в отдельных таблицах (схема data_models.py).
+    """
+
+    def __init__(self, path="data/journal.db", user_id=1, username="default"):
+        self.path = path
+        self.user_id = user_id
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        # Запись идёт и из фоновых потоков, поэтому соединение общее и защищено блокировкой
+        self._lock = threading.RLock()
+        self._next_id = None
+        self._owner = self  # у дневников из for_user счётчик id общий с этим
+        self._conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._owns_connection = True
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            self._add_missing_columns()
+        self._add_user(username)
+
+    def for_user(self, user_id, username=None):
+        """Дневник другого пользователя в той же базе: общие соединение, блокировка и счётчик id.
+
+        Так тысячи пользователей обходятся одним соединением, а id записей не пересекаются.
+        """
+        view = object.__new__(type(self))
+        view.path = self.path
+        view.user_id = user_id
+        view._lock = self._lock
+        view._conn = self._conn
+        view._owner = self
+        view._owns_connection = False
+        view._add_user(username or f"user{user_id}")
+        return view
+
+    def _add_missing_columns(self):
+        """Базы, созданные до появления столбца model_version, дополняются им"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(journal_entries)")}
+        if 'model_version' not in columns:
+            self._conn.execute("ALTER TABLE journal_entries ADD COLUMN model_version TEXT")
+
+    def _add_user(self, username):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO users (id, username) VALUES (?, ?)", (self.user_id, username)
+            )
+
+    # --- Чтение ---
+
+    def iter_entries(self, page_size=2000):
+        """Отдаёт все записи пользователя от старых к новым.
+
+        Строки читаются страницами по page_size: в памяти одна страница строк SQLite,
+        а не вся таблица рядом с готовыми записями; блокировка берётся на страницу.
+        """
+        last = ('', 0)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(SELECT_PAGE, (self.user_id, *last, page_size)).fetchall()
+            for row in rows:
+                yield self._row_to_entry(row)
+            if len(rows) < page_size:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def load(self):
+        return list(self.iter_entries())
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute(COUNT_ENTRIES, (self.user_id,)).fetchone()[0]
+
+    # --- Запись ---
+
+    def new_id(self):
+        """Выдаёт id для новой записи в момент её создания, ещё до сохранения.
+
+        Все id идут через этот счётчик, поэтому выданный, но ещё не сохранённый id
+        не достанется другой записи.
+        """
+        owner = self._owner
+        with self._lock:
+            if owner._next_id is None:
+                owner._next_id = self._conn.execute(NEXT_ID).fetchone()[0]
+            entry_id = owner._next_id
+            owner._next_id += 1
+            return entry_id
+
+    def append(self, entry):
+        """Сохраняет новую запись; если id ещё не назначен, назначает его"""
+        with self._lock, self._conn:
+            self._insert_entry(entry)
+        return entry['id']
+
+    def append_many(self, entries):
+        """Пакетная вставка одной транзакцией (миграция, импорт)"""
+        with self._lock, self._conn:
+            for entry in entries:
+                self._insert_entry(entry)
+
+    def update(self, entry):
+        with self._lock, self._conn:
+            self._conn.execute(UPDATE_ENTRY, self._entry_values(entry) + (entry['id'], self.user_id))
+            self._conn.execute(DELETE_TRIGGERS, (entry['id'],))
+            self._conn.execute(DELETE_SENSATIONS, (entry['id'],))
+            self._conn.execute(DELETE_THOUGHTS, (entry['id'],))
+            self._insert_items(entry)
+
+    def remove(self, entry_id):
+        with self._lock, self._conn:
+            self._conn.execute(DELETE_ENTRY, (entry_id, self.user_id))
+
+    def record_analysis(self, details):
+        """Сохраняет снимок долгосрочного анализа в user_analysis_history"""
+        with self._lock, self._conn:
+            self._conn.execute(INSERT_HISTORY, (self.user_id, json.dumps(details, ensure_ascii=False)))
+
+    def close(self):
+        # Общее соединение закрывает только тот, кто его открыл
+        if not self._owns_connection:
+            return
+        with self._lock:
+            self._conn.close()
+
+    # --- Переразметка новой моделью (backfill.py), по всем пользователям ---
+
+    def iter_texts(self, after_id=0, batch_size=1000, skip_version=None):
+        """Пачки [(id, текст)] в порядке id, начиная после after_id; в памяти только одна пачка.
+
+        skip_version — не отдавать записи, уже размеченные этой версией модели.
+        """
+        while True:
+            with self._lock:
+                rows = self._conn.execute(SELECT_TEXTS, {'after': after_id, 'skip': skip_version,
+                                                         'limit': batch_size}).fetchall()
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+
+    def count_after(self, after_id, skip_version=None):
+        with self._lock:
+            return self._conn.execute(COUNT_AFTER, {'after': after_id, 'skip': skip_version}).fetchone()[0]
+
+    def relabel_checkpoint(self, model_version):
+        """id последней переразмеченной записи для этой версии модели (0 — не начиналась)"""
+        with self._lock:
+            row = self._conn.execute(SELECT_PROGRESS, (model_version,)).fetchone()
+        return row[0] if row else 0
+
+    def apply_labels(self, labels, model_version):
+        """labels: [(id, эмоция, интенсивность, рекомендации JSON)] по возрастанию id.
+
+        Метки, отметка версии модели и продвижение контрольной точки — одна транзакция:
+        после сбоя пачка либо записана целиком, либо будет переразмечена заново.
+        """
+        if not labels:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                RELABEL_ENTRY, [(emotion, intensity, recommendation, model_version, entry_id)
+                                for entry_id, emotion, intensity, recommendation in labels]
+            )
+            self._conn.execute(SAVE_PROGRESS, (model_version, labels[-1][0]))
+
+    def reset_relabel(self, model_version):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM relabel_progress WHERE model_version = ?", (model_version,))
+
+    def migrate_from(self, source):
+        """Однократно переносит записи из другого хранилища (например, storage.JournalLog)"""
+        with self._lock:
+            migrated = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if migrated or self.count():
+            return False
+
+        entries = list(source.iter_entries())
+        self.append_many(entries)
+        with self._lock:
+            self._conn.execute("PRAGMA user_version = 1")
+        if entries:
+            print(f"Дневник перенесён в {self.path}: {len(entries)} записей")
+        return True
+
+    # --- Вспомогательное ---
+
+    def _insert_entry(self, entry):
+        if entry.get('id') is None:
+            entry['id'] = self.new_id()
+        elif self._owner._next_id is not None and entry['id'] >= self._owner._next_id:
+            self._owner._next_id = entry['id'] + 1
+        # model_version — какой моделью размечена запись; backfill.py такие записи не трогает
+        self._conn.execute(INSERT_ENTRY, (entry['id'], self.user_id) + self._entry_values(entry)
+                           + (entry.get('model_version'),))
+        self._insert_items(entry)
+
+    def _insert_items(self, entry):
+        entry_id = entry['id']
+        self._conn.executemany(INSERT_TRIGGER, [(entry_id, t) for t in entry.get('triggers', [])])
+        self._conn.executemany(INSERT_SENSATION, [(entry_id, s) for s in entry.get('physical_sensations', [])])
+        self._conn.executemany(INSERT_THOUGHT, [(entry_id, t) for t in entry.get('thoughts', [])])
+
+    @staticmethod
+    def _entry_values(entry):
+        recommendation = entry.get('recommendation')
+        return (
+            entry.get('timestamp', ''),
+            entry.get('text', ''),
+            entry.get('emotion', ''),
+            entry.get('intensity', 0),
+            json.dumps(entry.get('triggers', []), ensure_ascii=False),
+            json.dumps(entry.get('physical_sensations', []), ensure_ascii=False),
+            json.dumps(entry.get('thoughts', []), ensure_ascii=False),
+            json.dumps(recommendation, ensure_ascii=False) if recommendation is not None else None
+        )
+
+    @staticmethod
+    def _row_to_entry(row):
+        entry = {
+            'id': row[0],
+            'timestamp': row[1],
+            'text': row[2],
+            'triggers': json.loads(row[5]),
+            'physical_sensations': json.loads(row[6]),
+            'thoughts': json.loads(row[7]),
+            'emotion': row[3],
+            'intensity': row[4]
+        }
+        if row[8] is not None:
+            entry['recommendation'] = json.loads(row[8])
+        # Какой моделью размечена запись (insert и backfill.py); у старых записей её нет
+        if row[9] is not None:
+            entry['model_version'] = row[9]
+        return entry
+
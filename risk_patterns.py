@@ -0,0 +1,78 @@
+# risk_patterns.py - Поиск когнитивных паттернов риска в мыслях
+import json
+import re
+from collections import Counter
+
+
+DEFAULT_NEGATIVE_PATTERNS = {
+    'перфекционизм': ['должен быть идеальным', 'не могу ошибаться'],
+    'социальная тревожность': ['меня осудят', 'будут смеяться'],
+    'катастрофизация': ['все будет плохо', 'это катастрофа'],
+    'самокритика': ['я неудачник', 'я ничего не стою'],
+    'беспомощность': ['я не справлюсь', 'это бесполезно']
+}
+
+
+class RiskPatternMatcher:
+    """Один скомпилированный regex на всю таблицу паттернов.
+
+    Каждая мысль приводится к нижнему регистру один раз и просматривается за один проход,
+    поэтому добавление паттернов в таблицу почти не увеличивает стоимость проверки.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = {factor: list(items) for factor, items in patterns.items()}
+        self.factors = list(self.patterns)
+
+        owners = {}
+        for factor, items in self.patterns.items():
+            for pattern in items:
+                pattern = pattern.lower()
+                if pattern:
+                    owners.setdefault(pattern, set()).add(factor)
+
+        # Альтернативы отсортированы по убыванию длины, поэтому в каждой позиции
+        # находится самый длинный паттерн. Все остальные паттерны, совпавшие в той же
+        # позиции, — его префиксы, их факторы добавляем заранее.
+        ordered = sorted(owners, key=len, reverse=True)
+        self._factors_by_pattern = {
+            pattern: frozenset().union(*(owners[p] for p in owners if pattern.startswith(p)))
+            for pattern in ordered
+        }
+
+        if ordered:
+            # Опережающая проверка находит и перекрывающиеся вхождения
+            alternation = '|'.join(re.escape(p) for p in ordered)
+            self._regex = re.compile(f'(?=({alternation}))')
+        else:
+            self._regex = None
+
+    @classmethod
+    def from_file(cls, path, default=None):
+        """Загружает таблицу {фактор: [паттерны]} из JSON; при ошибке — таблица по умолчанию"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = f.read().lstrip('\ufeff')  # удаляем BOM
+            return cls(json.loads(raw))
+        except Exception as e:
+            print(f"Ошибка загрузки паттернов риска: {e}")
+            return cls(default if default is not None else DEFAULT_NEGATIVE_PATTERNS)
+
+    def match(self, thought):
+        """Множество факторов, найденных в одной мысли"""
+        if self._regex is None:
+            return set()
+        found = set()
+        for m in self._regex.finditer(thought.lower()):
+            found |= self._factors_by_pattern[m.group(1)]
+        return found
+
+    def count(self, thoughts):
+        """Counter {фактор: сколько мыслей под него попало}"""
+        hits = Counter()
+        for thought in thoughts:
+            hits.update(self.match(thought))
+        return hits
+
+    def has_risk(self, thoughts):
+        return any(self.match(thought) for thought in thoughts)
@@ -0,0 +1,173 @@
+# search_index.py - Полнотекстовый индекс по событиям и мыслям дневника
+import re
+from bisect import bisect_left, insort
+
+TOKEN_RE = re.compile(r'\w+')
+# Запрос оканчивается словом — последнее слово, возможно, ещё печатается
+UNFINISHED_RE = re.compile(r'\w$')
+
+FIELDS = ('text', 'thoughts')
+# Режимы поля «Искать в:» и соответствующие им поля записи
+SEARCH_FIELDS = {
+    "Событиях": ('text',),
+    "Мыслях": ('thoughts',),
+    "Всем тексте": FIELDS
+}
+
+
+def _load_stemmer():
+    """Стеммер Snowball для русского из nltk, если он установлен"""
+    try:
+        from nltk.stem.snowball import SnowballStemmer
+    except ImportError:
+        return None
+    return SnowballStemmer("russian")
+
+
+_stemmer = _load_stemmer()
+_stems = {}
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def _stem(token):
+    stem = _stems.get(token)
+    if stem is None:
+        stem = _stems[token] = _stemmer.stem(token)
+    return stem
+
+
+def tokenize(text, stemming=True):
+    """Слова текста: нижний регистр, ё -> е и (если есть nltk) основа слова"""
+    tokens = TOKEN_RE.findall(normalize(text))
+    if stemming and _stemmer is not None:
+        tokens = [_stem(token) for token in tokens]
+    return tokens
+
+
+def query_terms(query, stemming=True):
+    """Слова запроса: (основы законченных слов, начало недописанного слова или None).
+
+    Последнее слово без пробела или знака после него, возможно, ещё печатается: основа
+    его начала может не совпасть с основой целого слова («домо» и «домой»), поэтому оно
+    не стеммится и ищется как префикс исходных слов текста.
+    """
+    text = normalize(query)
+    words = TOKEN_RE.findall(text)
+    prefix = words.pop() if words and UNFINISHED_RE.search(text) else None
+    if stemming and _stemmer is not None:
+        words = [_stem(word) for word in words]
+    return words, prefix
+
+
+def _field_text(entry, field):
+    value = entry.get(field, '')
+    return '\n'.join(value) if isinstance(value, list) else value
+
+
+def entry_matches(entry, query, search_in=None, stemming=True):
+    """Проверка одной записи по тем же правилам, что и TextIndex.search"""
+    stems, prefix = query_terms(query, stemming)
+    if not stems and prefix is None:
+        return True
+    words = set()
+    for field in SEARCH_FIELDS.get(search_in, FIELDS):
+        words.update(tokenize(_field_text(entry, field), stemming=False))
+    if prefix is not None and not any(word.startswith(prefix) for word in words):
+        return False
+    if stemming and _stemmer is not None:
+        words = {_stem(word) for word in words}
+    return all(any(term.startswith(stem) for term in words) for stem in stems)
+
+
+class TextIndex:
+    """Инвертированный индекс: слово -> номера строк, отдельно для событий и для мыслей.
+
+    Поиск — по началам слов, не по подстроке: «раб» находит «работе», «бот» — нет.
+    Законченные слова запроса сравниваются по основам (если есть nltk), недописанное
+    последнее — как есть, с исходными словами; поэтому при стемминге в индексе два
+    словаря: основы и исходные слова. Каждое слово запроса ищется как префикс по
+    отсортированному словарю поля, так что время поиска зависит от числа совпадений,
+    а не от размера дневника. Номера строк добавляются по возрастанию, и списки
+    вхождений остаются отсортированными.
+    """
+
+    def __init__(self, stemming=True):
+        self.stemming = stemming
+        self.clear()
+
+    def clear(self):
+        self.stemmed = self.stemming and _stemmer is not None
+        self.postings = {field: {} for field in FIELDS}
+        self.vocabulary = {field: [] for field in FIELDS}
+        # Без стемминга исходные слова и есть термины индекса
+        self.word_postings = {field: {} for field in FIELDS} if self.stemmed else self.postings
+        self.word_vocabulary = {field: [] for field in FIELDS} if self.stemmed else self.vocabulary
+
+    def build(self, entries):
+        """Индекс по записям в порядке строк (0, 1, 2, ...)"""
+        self.clear()
+        for row, entry in enumerate(entries):
+            self._index_entry(row, entry)
+        # Словари сортируем один раз, а не вставкой каждого нового слова
+        for field in FIELDS:
+            self.vocabulary[field] = sorted(self.postings[field])
+            if self.stemmed:
+                self.word_vocabulary[field] = sorted(self.word_postings[field])
+
+    def add(self, row, entry):
+        """Добавляет запись со следующим номером строки"""
+        for vocabulary, term in self._index_entry(row, entry):
+            insort(vocabulary, term)
+
+    def _index_entry(self, row, entry):
+        """Возвращает новые термины: (словарь, куда их вставить, термин)"""
+        new_terms = []
+        for field in FIELDS:
+            words = set(tokenize(_field_text(entry, field), stemming=False))
+            indexes = [(self.word_postings[field], self.word_vocabulary[field], words)]
+            if self.stemmed:
+                indexes.append((self.postings[field], self.vocabulary[field], {_stem(word) for word in words}))
+            for postings, vocabulary, terms in indexes:
+                for term in terms:
+                    rows = postings.get(term)
+                    if rows is None:
+                        postings[term] = [row]
+                        new_terms.append((vocabulary, term))
+                    else:
+                        rows.append(row)
+        return new_terms
+
+    def search(self, query, search_in=None):
+        """Отсортированные номера строк, где каждое слово запроса начинает какое-то слово поля.
+
+        None — в запросе нет слов (поиск не ограничивает выборку).
+        """
+        stems, prefix = query_terms(query, self.stemming)
+        queries = [(self.postings, self.vocabulary, stem) for stem in set(stems)]
+        if prefix is not None:
+            queries.append((self.word_postings, self.word_vocabulary, prefix))
+        if not queries:
+            return None
+
+        fields = SEARCH_FIELDS.get(search_in, FIELDS)
+        result = None
+        # Сначала самые длинные (обычно более редкие) слова — пересечение быстрее сужается
+        for postings, vocabulary, token in sorted(queries, key=lambda q: len(q[2]), reverse=True):
+            rows = set()
+            for field in fields:
+                for term in _terms_with_prefix(vocabulary[field], token):
+                    rows.update(postings[field][term])
+            result = rows if result is None else result & rows
+            if not result:
+                return []
+        return sorted(result)
+
+
+def _terms_with_prefix(vocabulary, prefix):
+    position = bisect_left(vocabulary, prefix)
+    while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+        yield vocabulary[position]
+        position += 1
@@ -0,0 +1,311 @@
+# server.py - HTTP/JSON API анализа без окна приложения (asyncio, только стандартная библиотека)
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from analyzer import EmotionAnalyzer
+
+MAX_BODY_BYTES = 4 * 2 ** 20
+
+
+class Overloaded(Exception):
+    """В очереди на анализ больше записей, чем допускает max_pending"""
+
+
+class MicroBatcher:
+    """Собирает записи одновременных запросов в один вызов analyze_entries (один predict).
+
+    Первая запись открывает окно window_ms; всё, что пришло за это время, уходит в модель
+    одним пакетом (не больше max_batch). Пока пакет считается, новые записи копятся
+    и уходят следующим пакетом сразу после него — под нагрузкой пакеты растут сами.
+    Модель работает в одном рабочем потоке, цикл asyncio при этом свободен.
+    max_pending — сколько записей может ждать анализа: сверх него submit сразу
+    отказывает (Overloaded), а не растит очередь и задержку.
+    """
+
+    def __init__(self, analyze, window_ms=5, max_batch=256, max_pending=4096):
+        self.analyze = analyze  # список словарей записей -> список результатов (None — ошибка)
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        self.pending = 0
+        self.batches = 0
+        self.batched_entries = 0
+        self._queue = []  # (данные записи, future)
+        self._timer = None
+        self._busy = False
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="predict")
+
+    async def submit(self, entries_data):
+        """Результаты анализа в порядке записей; Overloaded — очередь заполнена"""
+        count = len(entries_data)
+        if self.pending + count > self.max_pending:
+            raise Overloaded()
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in entries_data]
+        self.pending += count
+        self._queue.extend(zip(entries_data, futures))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None and not self._busy:
+            self._timer = loop.call_later(self.window, self._flush)
+        try:
+            return await asyncio.gather(*futures)
+        finally:
+            self.pending -= count
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._closed:
+            # После shutdown исполнитель закрыт: записи из очереди уже не посчитаются
+            self._cancel(self._queue)
+            self._queue = []
+            return
+        # Пока модель занята, записи ждут: уйдут одним пакетом, когда она освободится
+        if self._busy or not self._queue:
+            return
+
+        batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+        self._busy = True
+        self.batches += 1
+        self.batched_entries += len(batch)
+        task = asyncio.get_running_loop().run_in_executor(
+            self._executor, self.analyze, [entry_data for entry_data, _ in batch]
+        )
+        task.add_done_callback(lambda done: self._deliver(batch, done))
+
+    def _deliver(self, batch, done):
+        self._busy = False
+        if done.cancelled():
+            # Пакет отменён при остановке (shutdown): ждущим — отмена, а не исключение в колбэке
+            self._cancel(batch)
+        else:
+            error = done.exception()
+            results = done.result() if error is None else [None] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        self._flush()
+
+    def _cancel(self, items):
+        for _, future in items:
+            future.cancel()
+
+    def shutdown(self):
+        """Вызывается из цикла asyncio: ожидающие записи отменяются, новые пакеты не запускаются"""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._flush()
+
+
+class AnalysisServer:
+    """Эндпоинты /analyze, /analyze/batch, /report и /health поверх одного EmotionAnalyzer.
+
+    Модель загружена один раз до старта. max_requests ограничивает число запросов,
+    обрабатываемых одновременно: остальные ждут на своих соединениях.
+    Анализ не сохраняет записи в анализаторе: память сервера не растёт от запросов,
+    а /report строится по истории, загруженной при старте (--journal).
+    """
+
+    def __init__(self, analyzer, window_ms=5, max_batch=256, max_pending=4096, max_requests=64):
+        self.analyzer = analyzer
+        self.batcher = MicroBatcher(self._analyze_batch, window_ms, max_batch, max_pending)
+        self._slots = asyncio.Semaphore(max_requests)
+        self.routes = {
+            ('POST', '/analyze'): self._analyze,
+            ('POST', '/analyze/batch'): self._analyze_many,
+            ('GET', '/report'): self._report,
+            ('GET', '/health'): self._health,
+        }
+
+    def _analyze_batch(self, entries_data):
+        """Выполняется в рабочем потоке: анализ и сериализация пакета"""
+        analyses = self.analyzer.analyze_entries(entries_data, record=False)
+        return [analysis.model_dump() if analysis is not None else None for analysis in analyses]
+
+    # --- Эндпоинты: (статус, тело ответа) ---
+
+    async def _analyze(self, body):
+        if not isinstance(body, dict):
+            return HTTPStatus.BAD_REQUEST, {"error": "Ожидается объект записи"}
+        result, = await self.batcher.submit([body])
+        if result is None:
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {"error": "Некорректная запись"}
+        return HTTPStatus.OK, result
+
+    async def _analyze_many(self, body):
+        entries = body.get('entries') if isinstance(body, dict) else None
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            return HTTPStatus.BAD_REQUEST, {"error": "Ожидается {\"entries\": [...]}"}
+        # Такой пакет не поместится в очередь никогда: повтор не поможет, поэтому 413, а не 503
+        if len(entries) > self.batcher.max_pending:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {
+                "error": f"Не больше {self.batcher.max_pending} записей в одном запросе"
+            }
+        # Некорректные записи — null на своих местах
+        return HTTPStatus.OK, {"results": await self.batcher.submit(entries) if entries else []}
+
+    async def _report(self, body):
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(None, self.analyzer.generate_long_term_report)
+        if report is None:
+            return HTTPStatus.NOT_FOUND, {"error": "Нет записей для отчёта"}
+        return HTTPStatus.OK, report.model_dump()
+
+    async def _health(self, body):
+        batcher = self.batcher
+        return HTTPStatus.OK, {
+            "model_loaded": self.analyzer.model is not None,
+            "entries": len(self.analyzer.entries),
+            "pending": batcher.pending,
+            "batches": batcher.batches,
+            "mean_batch": batcher.batched_entries / batcher.batches if batcher.batches else 0,
+            "prediction_cache": self.analyzer.prediction_cache.stats(),
+        }
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                async with self._slots:
+                    status, payload = await self._dispatch(method, path, body)
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        if isinstance(body, HTTPStatus):
+            return body, {"error": body.phrase}
+        handler = self.routes.get((method, path))
+        if handler is None:
+            known = any(route_path == path for _, route_path in self.routes)
+            status = HTTPStatus.METHOD_NOT_ALLOWED if known else HTTPStatus.NOT_FOUND
+            return status, {"error": status.phrase}
+        try:
+            return await handler(body)
+        except Overloaded:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Сервер перегружен, повторите позже"}
+        except Exception as e:
+            print(f"Ошибка обработки {method} {path}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.batcher.shutdown()
+
+
+async def _read_request(reader):
+    """(метод, путь, keep-alive, тело) или None, если клиент закрыл соединение.
+
+    Тело — разобранный JSON или HTTPStatus ошибки разбора.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        return 'GET', '', False, HTTPStatus.BAD_REQUEST
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+    path = target.split('?', 1)[0]
+
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        length = -1
+    # Без верной длины границу тела не найти: отвечаем 400 и закрываем соединение
+    if length < 0:
+        return method, path, False, HTTPStatus.BAD_REQUEST
+    if length > MAX_BODY_BYTES:
+        return method, path, False, HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    body = None
+    if length:
+        raw = await reader.readexactly(length)
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            body = HTTPStatus.BAD_REQUEST
+    return method, path, keep_alive, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    headers = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == HTTPStatus.SERVICE_UNAVAILABLE:
+        headers.append("Retry-After: 1")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON API анализа записей дневника")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default="model/emotion_model.bin")
+    parser.add_argument("--journal", help="SQLite-дневник (data/journal.db), история которого войдёт в /report")
+    parser.add_argument("--window-ms", type=float, default=5, help="окно сбора записей в один predict")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-pending", type=int, default=4096, help="записей в очереди, сверх — 503")
+    parser.add_argument("--max-requests", type=int, default=64, help="запросов в обработке одновременно")
+    args = parser.parse_args()
+
+    analyzer = EmotionAnalyzer(args.model)
+    # Модель грузится до открытия порта: первый запрос не ждёт загрузки
+    if analyzer.model is None:
+        raise SystemExit(f"Модель {args.model} не загружена")
+    if args.journal:
+        from repository import JournalRepository
+        analyzer.load_entries(JournalRepository(args.journal))
+
+    async def run():
+        server = AnalysisServer(analyzer, args.window_ms, args.max_batch, args.max_pending, args.max_requests)
+        print(f"Сервер анализа: http://{args.host}:{args.port} (записей в истории: {len(analyzer.entries)})")
+        await server.serve(args.host, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
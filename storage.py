@@ -0,0 +1,68 @@
+# storage.py - Чтение прежних форматов дневника для переноса в SQLite (repository.py)
+import json
+import os
+
+
+class JournalLog:
+    """Записи из прежних хранилищ: журнала JSON Lines или journal_entries.json.
+
+    Только чтение: дневник хранится в repository.JournalRepository, а этот класс — источник
+    для однократного JournalRepository.migrate_from. В журнале JSON Lines одна строка —
+    одна запись; изменение записи — её новая версия с тем же id, удаление — строка-надгробие
+    {"id": ..., "_deleted": true}.
+    """
+
+    def __init__(self, path="data/journal_entries.jsonl", legacy_path="data/journal_entries.json"):
+        self.path = path
+        self.legacy_path = legacy_path
+
+    def iter_entries(self):
+        """Отдаёт актуальные записи от старых к новым.
+
+        Если журнала JSON Lines нет, читается старый journal_entries.json (список, новые сверху).
+        """
+        if os.path.exists(self.path):
+            yield from self._iter_log()
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            yield from self._iter_legacy()
+
+    def load(self):
+        return list(self.iter_entries())
+
+    def _iter_log(self):
+        """Запись отдаётся на месте своей последней версии.
+
+        Два прохода по файлу: первый запоминает только id и номер строки последней версии
+        (удалённые — None), второй разбирает строки заново и отдаёт записи по одной,
+        так что в памяти не держится весь журнал.
+        """
+        last_line = {}
+        for number, record in self._records():
+            # Оборванная строка после сбоя (record is None) пропускается
+            if record is not None:
+                last_line[record.get('id')] = None if record.get('_deleted') else number
+
+        for number, record in self._records():
+            if record is not None and last_line.get(record.get('id')) == number:
+                yield record
+
+    def _records(self):
+        """(номер строки, запись) по всем строкам журнала; битая строка — запись None"""
+        with open(self.path, encoding="utf-8") as f:
+            for number, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+    def _iter_legacy(self):
+        with open(self.legacy_path, encoding="utf-8") as f:
+            legacy = json.load(f)
+
+        entries = [entry for entry in reversed(legacy) if isinstance(entry, dict)]
+        for entry_id, entry in enumerate(entries, start=1):
+            entry.setdefault('id', entry_id)
+            yield entry
@@ -0,0 +1,7 @@
+# conftest.py - Модули приложения лежат в корне репозитория, тесты запускаются из него
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,103 @@
+# test_aggregates.py - Накопительный отчёт совпадает с пересчётом с нуля
+from aggregates import AggregationEngine, ReportAggregator, summarize
+from analyzer import EmotionAnalyzer
+from model_loader import ModelLoader
+from risk_patterns import DEFAULT_NEGATIVE_PATTERNS, RiskPatternMatcher
+
+
+def make_entry(i, timestamp=None, thoughts=None):
+    return {
+        'id': i,
+        'timestamp': f"2024-01-{i % 28 + 1:02d} 10:00" if timestamp is None else timestamp,
+        'text': f"запись {i}",
+        'triggers': ["работа", "семья", "сон"][:i % 3],
+        'physical_sensations': ["усталость"] if i % 2 else [],
+        'thoughts': ["я не справлюсь", "все будет плохо", "надо отдохнуть"][:i % 4] if thoughts is None else thoughts,
+        'emotion': ["грусть", "тревога", "радость"][i % 3],
+        'intensity': i % 10
+    }
+
+
+def sample_entries(count=60):
+    entries = [make_entry(i) for i in range(count)]
+    # Записи без мыслей и без даты
+    entries += [make_entry(count, thoughts=[]), make_entry(count + 1, timestamp=""),
+                make_entry(count + 2, timestamp="", thoughts=[])]
+    no_fields = make_entry(count + 3)
+    del no_fields['thoughts'], no_fields['timestamp']
+    entries.append(no_fields)
+    return entries
+
+
+def aggregate_state(aggregates):
+    return {
+        'total': aggregates.total,
+        'emotion_by_date': aggregates.emotion_trend(),
+        'emotion_counts': dict(aggregates.emotion_counts),
+        'trigger_counts': dict(aggregates.trigger_counts),
+        'sensation_counts': dict(aggregates.sensation_counts),
+        'thought_counts': dict(aggregates.thought_counts),
+        'days': aggregates.days,
+        'emotions': aggregates.emotions,
+        'intensities': aggregates.intensities,
+    }
+
+
+def test_incremental_aggregates_match_summarize():
+    entries = sample_entries()
+    count_risks = RiskPatternMatcher(DEFAULT_NEGATIVE_PATTERNS).count
+
+    incremental = ReportAggregator(count_risks)
+    incremental.extend(entries[:20])
+    for entry in entries[20:]:
+        incremental.add(entry)
+
+    assert aggregate_state(incremental) == aggregate_state(summarize(entries))
+    # Записи без даты учитываются в счётчиках, но не в рядах по дням
+    assert incremental.total == len(entries)
+    assert len(incremental.days) == sum(1 for entry in entries if entry.get('timestamp'))
+
+    rebuilt = ReportAggregator(count_risks)
+    rebuilt.rebuild(entries)
+    assert incremental.risk_hits == rebuilt.risk_hits
+    assert incremental.risk_hits
+
+
+def test_report_after_appends_matches_rebuild():
+    entries = sample_entries()
+    analyzer = EmotionAnalyzer(model_loader=ModelLoader.from_model(None),
+                               risk_matcher=RiskPatternMatcher(DEFAULT_NEGATIVE_PATTERNS))
+    analyzer.entries = entries[:10]
+
+    for entry in entries[10:]:
+        analyzer.entries.append(entry)
+        report = analyzer.generate_long_term_report()
+        assert report.model_dump() == analyzer.generate_long_term_report(rebuild=True).model_dump()
+
+
+def test_report_without_thoughts():
+    analyzer = EmotionAnalyzer(model_loader=ModelLoader.from_model(None),
+                               risk_matcher=RiskPatternMatcher(DEFAULT_NEGATIVE_PATTERNS))
+    analyzer.entries = [make_entry(1, thoughts=[]), make_entry(2, timestamp="", thoughts=[])]
+    analyzer.entries.append(make_entry(3, thoughts=[]))
+
+    report = analyzer.generate_long_term_report()
+    assert report.model_dump() == analyzer.generate_long_term_report(rebuild=True).model_dump()
+    assert report.risk_factors == {"": "Не выявлены"}
+
+
+def test_engine_advance_matches_full_pass():
+    entries = sample_entries()
+    engine = AggregationEngine()
+    engine.get((1, ()), entries[:30])
+
+    engine.advance((1, ()), (2, ()), entries[30:])
+    passes = engine.passes
+    advanced = engine.get((2, ()), entries)
+    assert engine.passes == passes
+    assert aggregate_state(advanced) == aggregate_state(summarize(entries))
+
+    # Агрегатов старой версии нет — новая посчитается полным проходом при get
+    engine.advance((5, ()), (6, ()), entries)
+    assert aggregate_state(engine.get((6, ()), entries)) == aggregate_state(summarize(entries))
+    assert engine.passes == passes + 1
@@ -0,0 +1,80 @@
+# test_search_index.py - Поиск по началам слов: индекс и проверка одной записи
+import pytest
+
+import search_index
+from search_index import TextIndex, entry_matches, query_terms
+
+ENDINGS = sorted(('ами', 'ого', 'ать', 'ает', 'ом', 'ой', 'ая', 'а', 'е', 'у', 'ы', 'и', 'ь'),
+                 key=len, reverse=True)
+
+
+class FakeStemmer:
+    """Отрезает окончание — вместо nltk, которого может не быть"""
+
+    def stem(self, word):
+        for ending in ENDINGS:
+            if word.endswith(ending) and len(word) > len(ending) + 2:
+                return word[:-len(ending)]
+        return word
+
+
+@pytest.fixture
+def stemmer(monkeypatch):
+    monkeypatch.setattr(search_index, '_stemmer', FakeStemmer())
+    monkeypatch.setattr(search_index, '_stems', {})
+
+
+ENTRIES = [
+    {'text': "Иду домой", 'thoughts': []},
+    {'text': "Дома тихо", 'thoughts': ["всё хорошо"]},
+    {'text': "Устал на работе", 'thoughts': ["начальник недоволен"]},
+    {'text': "Поругался с начальником", 'thoughts': []},
+]
+
+
+def search(query, search_in=None, stemming=True):
+    index = TextIndex(stemming)
+    index.build(ENTRIES)
+    return index.search(query, search_in)
+
+
+def test_unfinished_word_is_not_stemmed(stemmer):
+    assert query_terms("дома ти") == (['дом'], 'ти')
+    # Основа «домо» не совпала бы ни с «дом», ни с «домой» как префикс основы
+    assert search("домо") == [0]
+    assert search("Дом") == [0, 1]
+
+
+def test_finished_word_is_stemmed(stemmer):
+    assert query_terms("дома ") == (['дом'], None)
+    assert search("дома ") == [0, 1]
+    assert search("начальником,") == [2, 3]
+
+
+def test_word_prefix_not_substring(stemmer):
+    assert search("раб") == [2]
+    assert search("бот") == []
+    assert search("ома") == []
+
+
+def test_words_are_combined_with_and(stemmer):
+    assert search("устал раб") == [2]
+    assert search("дома устал") == []
+    assert search("начальник", "Мыслях") == [2]
+    assert search("все хорошо", "Событиях") == []
+    assert search("  ") is None
+
+
+@pytest.mark.parametrize('stemming', [True, False])
+@pytest.mark.parametrize('query', ["домо", "дома ", "Дом", "раб", "бот", "начальником ", "все хор", "дома устал"])
+def test_entry_matches_agrees_with_index(stemmer, query, stemming):
+    expected = [row for row, entry in enumerate(ENTRIES) if entry_matches(entry, query, stemming=stemming)]
+    assert search(query, stemming=stemming) == expected
+
+
+def test_add_matches_build(stemmer):
+    index = TextIndex()
+    for row, entry in enumerate(ENTRIES):
+        index.add(row, entry)
+    for query in ("домо", "дома ", "раб", "начальник"):
+        assert index.search(query) == search(query)
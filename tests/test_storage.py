@@ -0,0 +1,53 @@
+# test_storage.py - Чтение прежних форматов дневника и перенос в SQLite
+import json
+
+from repository import JournalRepository
+from storage import JournalLog
+
+
+def write_lines(path, records, tail=""):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.write(tail)
+
+
+def test_log_resolves_updates_and_deletes(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_lines(path, [
+        {'id': 1, 'text': "первая"},
+        {'id': 2, 'text': "вторая"},
+        {'id': 3, 'text': "третья"},
+        {'id': 2, 'text': "вторая, исправленная"},
+        {'id': 3, '_deleted': True},
+        {'id': 4, 'text': "четвёртая"},
+    ], tail='{"id": 5, "text": "оборва')
+
+    texts = [entry['text'] for entry in JournalLog(str(path), legacy_path=None).iter_entries()]
+    # Изменённая запись — на месте последней версии, удалённая и оборванная пропадают
+    assert texts == ["первая", "вторая, исправленная", "четвёртая"]
+
+
+def test_legacy_json_read_oldest_first(tmp_path):
+    legacy = tmp_path / "journal_entries.json"
+    legacy.write_text(json.dumps([{'text': "новая"}, "мусор", {'text': "старая"}], ensure_ascii=False),
+                      encoding='utf-8')
+
+    log = JournalLog(str(tmp_path / "journal.jsonl"), legacy_path=str(legacy))
+    assert log.load() == [{'id': 1, 'text': "старая"}, {'id': 2, 'text': "новая"}]
+    # Только чтение: журнал JSON Lines не создаётся
+    assert not (tmp_path / "journal.jsonl").exists()
+
+
+def test_migrate_from_log_once(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    entry = {'id': 7, 'timestamp': "2024-01-01 10:00", 'text': "запись", 'triggers': ["работа"],
+             'physical_sensations': [], 'thoughts': ["я устал"], 'emotion': "грусть", 'intensity': 4}
+    write_lines(path, [entry])
+
+    journal = JournalRepository(str(tmp_path / "journal.db"))
+    assert journal.migrate_from(JournalLog(str(path), legacy_path=None))
+    assert journal.load() == [entry]
+    assert not journal.migrate_from(JournalLog(str(path), legacy_path=None))
+    assert journal.new_id() == 8
+    journal.close()
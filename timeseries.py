@@ -0,0 +1,118 @@
+# timeseries.py - Временные ряды эмоций на numpy: интервал × эмоция
+from datetime import date
+
+import numpy as np
+
+# Шаг ряда и его примерная длина в днях (для перевода скользящего окна в интервалы)
+FREQUENCY_DAYS = {'day': 1, 'week': 7, 'month': 30}
+FREQUENCY_LABELS = {'day': "по дням", 'week': "по неделям", 'month': "по месяцам"}
+
+
+def auto_frequency(span_days, max_points=400):
+    """Самый мелкий шаг, при котором на линию приходится не больше max_points точек"""
+    for frequency, days in FREQUENCY_DAYS.items():
+        if span_days / days <= max_points:
+            return frequency
+    return 'month'
+
+
+def _rolling_sum(matrix, window):
+    """Сумма за последние window строк (для первых строк — за сколько есть)"""
+    cumulative = np.cumsum(matrix, axis=0)
+    result = cumulative.copy()
+    result[window:] -= cumulative[:-window]
+    return result
+
+
+class EmotionTimeline:
+    """Записи как колонки numpy: порядковый номер дня, код эмоции, интенсивность.
+
+    Матрицы интервал × эмоция считаются одним np.bincount по плоскому индексу
+    (интервал * число эмоций + код), поэтому даже многолетний дневник сводится
+    в ряды за миллисекунды; недели и месяцы — тот же bincount с другим номером интервала.
+    """
+
+    def __init__(self, days, emotions, intensities):
+        """days — строки 'ГГГГ-ММ-ДД', emotions — названия, intensities — числа (списки одной длины)"""
+        # Коды дней и эмоций — через словари: на строках это быстрее np.unique
+        day_index, emotion_index = {}, {}
+        day_codes = np.array([day_index.setdefault(d, len(day_index)) for d in days], dtype=np.int64)
+        emotion_codes = np.array([emotion_index.setdefault(e, len(emotion_index)) for e in emotions], dtype=np.int64)
+
+        # Дата разбирается один раз на уникальный день
+        parsed = []
+        for name in day_index:
+            try:
+                parsed.append(date.fromisoformat(name))
+            except ValueError:
+                parsed.append(None)
+        valid = np.array([d is not None for d in parsed], dtype=bool)
+        rows = valid[day_codes]
+
+        day_ordinals = np.array([d.toordinal() if d else 0 for d in parsed], dtype=np.int64)
+        day_months = np.array([d.year * 12 + d.month - 1 if d else 0 for d in parsed], dtype=np.int64)
+        self.ordinal = day_ordinals[day_codes[rows]]
+        self.month = day_months[day_codes[rows]]
+        self.intensity = np.asarray(intensities, dtype=float).reshape(-1)[rows]
+
+        # Эмоции по алфавиту: порядок линий и легенды не зависит от порядка записей
+        emotion_codes = emotion_codes[rows]
+        names = list(emotion_index)
+        present = sorted(np.unique(emotion_codes).tolist(), key=lambda code: names[code])
+        recode = np.zeros(len(names), dtype=np.int64)
+        recode[present] = np.arange(len(present))
+        self.emotions = [names[code] for code in present]
+        self.code = recode[emotion_codes]
+
+    def __len__(self):
+        return len(self.code)
+
+    @property
+    def span_days(self):
+        return int(self.ordinal.max() - self.ordinal.min()) + 1 if len(self) else 0
+
+    def _buckets(self, frequency):
+        """Номер интервала каждой записи и порядковые номера первых дней интервалов"""
+        if frequency == 'month':
+            first = int(self.month.min())
+            count = int(self.month.max()) - first + 1
+            starts = np.array([date(m // 12, m % 12 + 1, 1).toordinal() for m in range(first, first + count)])
+            return self.month - first, starts
+        # Неделя начинается с понедельника: день с порядковым номером 1 (01.01.0001) — понедельник
+        step = 7 if frequency == 'week' else 1
+        keys = self.ordinal - (self.ordinal - 1) % step
+        first = int(keys.min())
+        starts = np.arange(first, int(keys.max()) + 1, step)
+        return (keys - first) // step, starts
+
+    def _matrix(self, buckets, size, weights=None):
+        flat = buckets * len(self.emotions) + self.code
+        counts = np.bincount(flat, weights=weights, minlength=size * len(self.emotions))
+        return counts.reshape(size, len(self.emotions)).astype(float)
+
+    def _window(self, frequency, window):
+        return max(1, round(window / FREQUENCY_DAYS[frequency])) if window else 1
+
+    def counts(self, frequency='day', window=None):
+        """(первые дни интервалов, матрица интервал × эмоция с числом записей).
+
+        window — скользящее окно в днях (7, 30): сумма за окно, переведённое в интервалы шага.
+        """
+        buckets, starts = self._buckets(frequency)
+        matrix = self._matrix(buckets, len(starts))
+        width = self._window(frequency, window)
+        if width > 1:
+            matrix = _rolling_sum(matrix, width)
+        return starts, matrix
+
+    def means(self, frequency='day', window=None):
+        """(первые дни интервалов, средняя интенсивность записей с интенсивностью > 0; NaN — нет данных)"""
+        buckets, starts = self._buckets(frequency)
+        rated = self.intensity > 0
+        sums = self._matrix(buckets, len(starts), np.where(rated, self.intensity, 0.0))
+        counts = self._matrix(buckets, len(starts), rated.astype(float))
+        width = self._window(frequency, window)
+        if width > 1:
+            sums, counts = _rolling_sum(sums, width), _rolling_sum(counts, width)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return starts, np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
@@ -0,0 +1,73 @@
+# timing.py - Замеры времени операций приложения
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Момент импорта модуля — точка отсчёта для замеров запуска приложения
+PROCESS_START = time.perf_counter()
+
+
+class Timer:
+    """Хранит последние замеры одной операции и предупреждает о превышении бюджета"""
+
+    def __init__(self, name, budget_ms=None, keep=200):
+        self.name = name
+        self.budget_ms = budget_ms
+        self.samples = deque(maxlen=keep)
+        self.over_budget = 0
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record((time.perf_counter() - start) * 1000)
+
+    def record(self, elapsed_ms):
+        self.samples.append(elapsed_ms)
+        if self.budget_ms is not None and elapsed_ms > self.budget_ms:
+            self.over_budget += 1
+            print(f"[время] {self.name}: {elapsed_ms:.1f} мс (бюджет {self.budget_ms} мс)")
+
+    @property
+    def last(self):
+        return self.samples[-1] if self.samples else None
+
+    def summary(self):
+        if not self.samples:
+            return {"name": self.name, "count": 0}
+        ordered = sorted(self.samples)
+        return {
+            "name": self.name,
+            "count": len(ordered),
+            "last_ms": round(self.samples[-1], 2),
+            "median_ms": round(ordered[len(ordered) // 2], 2),
+            "max_ms": round(ordered[-1], 2),
+            "over_budget": self.over_budget
+        }
+
+
+_timers = {}
+
+
+def get_timer(name, budget_ms=None):
+    """Общий реестр таймеров: один объект на имя операции"""
+    timer = _timers.get(name)
+    if timer is None:
+        timer = _timers[name] = Timer(name, budget_ms)
+    elif budget_ms is not None:
+        timer.budget_ms = budget_ms
+    return timer
+
+
+def mark_startup(name):
+    """Фиксирует, сколько прошло от запуска до события name"""
+    elapsed_ms = (time.perf_counter() - PROCESS_START) * 1000
+    get_timer(name).record(elapsed_ms)
+    print(f"[запуск] {name}: {elapsed_ms:.0f} мс")
+    return elapsed_ms
+
+
+def all_timings():
+    return [timer.summary() for timer in _timers.values()]
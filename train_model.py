@@ -1,27 +1,384 @@
 import fasttext
 import json
+import argparse
+import hashlib
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 
-def train_emotion_model():
-    # Параметры обучения
-    settings = {
-        "input": r"D:/Software/Necessary/Dippploom/KOOOOD/MentalHealthApp/data/emotions.txt",
-        "epoch": 50, # Количество проходов по данным
-        "lr": 0.1,  # Скорость обучения
-        "wordNgrams": 2, # Учитываем сочетания слов
-        "dim": 100,
-        "loss": "softmax"
-    }
+DATA_PATH = "data/emotions.txt"
+MODEL_PATH = "model/emotion_model.bin"
+CACHE_DIR = "model/cache"
+
+# Параметры обучения по умолчанию
+DEFAULT_SETTINGS = {
+    "epoch": 50, # Количество проходов по данным
+    "lr": 0.1,  # Скорость обучения
+    "wordNgrams": 2, # Учитываем сочетания слов
+    "dim": 100,
+    "loss": "softmax"
+}
+
+# Сетка перебора по умолчанию (для --search grid)
+DEFAULT_GRID = {
+    "epoch": [25, 50],
+    "lr": [0.1, 0.5],
+    "wordNgrams": [1, 2],
+    "dim": [50, 100]
+}
+
+
+def quantized_path(model_path):
+    """model/emotion_model.bin -> model/emotion_model.ftz"""
+    return os.path.splitext(model_path)[0] + ".ftz"
+
+
+def train_emotion_model(data_path=DATA_PATH, model_path=MODEL_PATH, quantize=False, cutoff=100000, retrain=True,
+                        threads=None):
+    """Обучение на всём наборе с параметрами по умолчанию, без перебора и кэша"""
+    # Потоков — по числу ядер, как в переборе (у FastText по умолчанию 12 независимо от машины)
+    settings = dict(DEFAULT_SETTINGS, input=data_path, thread=threads or os.cpu_count() or 1)
 
     # Дообучение модели
     model = fasttext.train_supervised(**settings)
 
     # Сохранение модели
-    model.save_model(r"D:/Software/Necessary/Dippploom/KOOOOD/MentalHealthApp/model/emotion_model.bin")
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    model.save_model(model_path)
     print("Модель успешно дообучена и сохранена")
 
+    if quantize:
+        save_quantized(model, settings["input"], quantized_path(model_path), cutoff=cutoff, retrain=retrain)
+
+    return model
+
+
+def save_quantized(model, train_path, path, cutoff=100000, retrain=True):
+    """Сжимает модель (product quantization) и сохраняет .ftz.
+
+    cutoff — сколько самых важных слов/n-грамм оставить в словаре,
+    retrain — дообучить модель после отсечения словаря (медленнее, но точнее).
+    Квантование меняет модель на месте, поэтому полную модель нужно сохранить до вызова.
+    """
+    model.quantize(input=train_path, qnorm=True, retrain=retrain, cutoff=cutoff)
+    model.save_model(path)
+    print(f"Сжатая модель сохранена: {path}")
+    return path
+
+
+def split_dataset(path, valid_ratio=0.2, seed=42, out_dir=None):
+    """Воспроизводимо делит размеченный файл на обучающую и отложенную части"""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.lstrip('\ufeff') for line in f if line.strip()]
+
+    random.Random(seed).shuffle(lines)
+    n_valid = max(1, int(len(lines) * valid_ratio))
+
+    out_dir = out_dir or os.path.dirname(path)
+    base = os.path.splitext(os.path.basename(path))[0]
+    train_path = os.path.join(out_dir, f"{base}.train.txt")
+    valid_path = os.path.join(out_dir, f"{base}.valid.txt")
+    with open(train_path, "w", encoding="utf-8") as f:
+        f.writelines(lines[n_valid:])
+    with open(valid_path, "w", encoding="utf-8") as f:
+        f.writelines(lines[:n_valid])
+    return train_path, valid_path
+
+
+def _resident_memory_mb():
+    """Пиковая резидентная память процесса, МБ (psutil, если есть; иначе resource на Unix)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдаёт килобайты, macOS — байты
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+    except ImportError:
+        return None
+
+
+def _measure_model(model_path, valid_path, queue):
+    """Выполняется в отдельном процессе, чтобы память одной модели не мешала замеру другой"""
+    baseline = _resident_memory_mb()
+    start = time.perf_counter()
+    model = fasttext.load_model(model_path)
+    load_seconds = time.perf_counter() - start
+    loaded = _resident_memory_mb()
+
+    with open(valid_path, encoding="utf-8") as f:
+        texts = [" ".join(w for w in line.split() if not w.startswith("__label__")) for line in f]
+    texts = [t for t in texts if t]
+
+    start = time.perf_counter()
+    for text in texts:
+        model.predict(text)
+    latency_ms = (time.perf_counter() - start) / max(1, len(texts)) * 1000
+
+    _, precision, _ = model.test(valid_path)
+    queue.put({
+        "model": model_path,
+        "size_mb": os.path.getsize(model_path) / 2 ** 20,
+        "memory_mb": loaded - baseline if loaded is not None and baseline is not None else None,
+        "load_ms": load_seconds * 1000,
+        "latency_ms": latency_ms,
+        "accuracy": precision
+    })
+
+
+def compare_models(model_paths, valid_path):
+    """Таблица: размер файла, память, время загрузки, задержка предсказания, точность"""
+    import multiprocessing
+
+    results = []
+    for path in model_paths:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_measure_model, args=(path, valid_path, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"{'Модель':40} {'Файл, МБ':>9} {'Память, МБ':>11} {'Загрузка, мс':>13} {'Предсказание, мс':>17} {'Точность':>9}")
+    for r in results:
+        memory = f"{r['memory_mb']:.1f}" if r['memory_mb'] is not None else "—"
+        print(f"{os.path.basename(r['model']):40} {r['size_mb']:9.2f} {memory:>11} "
+              f"{r['load_ms']:13.1f} {r['latency_ms']:17.3f} {r['accuracy']:9.3f}")
+    return results
+
+
+def evaluate_quantization(data_path=DATA_PATH, out_dir=None, cutoff=100000, retrain=True, threads=None):
+    """Обучает полную и сжатую модели на обучающей части и сравнивает их на отложенной.
+
+    Модели пишутся в out_dir (по умолчанию — временный каталог), рабочая модель не трогается.
+    """
+    if out_dir is None:
+        out_dir = tempfile.mkdtemp(prefix="emotion-compare-")
+    os.makedirs(out_dir, exist_ok=True)
+    train_path, valid_path = split_dataset(data_path, out_dir=out_dir)
+    model = fasttext.train_supervised(input=train_path, thread=threads or os.cpu_count() or 1, **DEFAULT_SETTINGS)
+    model_path = os.path.join(out_dir, os.path.basename(MODEL_PATH))
+    model.save_model(model_path)
+    ftz_path = save_quantized(model, train_path, quantized_path(model_path), cutoff=cutoff, retrain=retrain)
+    return compare_models([model_path, ftz_path], valid_path)
+
+
+# --- Перебор параметров с кэшем ---
+
+def dataset_hash(path):
+    """SHA-256 содержимого набора данных — часть ключа кэша"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(data_hash, split, params):
+    """Ключ кэша: набор данных + разбиение + параметры обучения"""
+    payload = json.dumps({"data": data_hash, "split": split, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def grid_configs(grid):
+    keys = sorted(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield dict(DEFAULT_SETTINGS, **dict(zip(keys, values)))
+
+
+def _train_config(train_path, valid_path, params, threads, model_file, metrics_file):
+    """Выполняется в процессе пула: обучает одну конфигурацию и сохраняет модель с метриками"""
+    start = time.perf_counter()
+    model = fasttext.train_supervised(input=train_path, thread=threads, verbose=0, **params)
+    train_seconds = time.perf_counter() - start
+    model.save_model(model_file)
+
+    n, precision, recall = model.test(valid_path)
+    metrics = {
+        "params": params,
+        "samples": n,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "train_seconds": train_seconds
+    }
+    with open(metrics_file, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    return metrics
+
+
+def _autotune(train_path, valid_path, duration, threads, model_file, metrics_file):
+    """Автоподбор параметров средствами FastText по отложенной выборке"""
+    start = time.perf_counter()
+    model = fasttext.train_supervised(
+        input=train_path, autotuneValidationFile=valid_path,
+        autotuneDuration=duration, thread=threads, verbose=0
+    )
+    train_seconds = time.perf_counter() - start
+    model.save_model(model_file)
+
+    args = model.f.getArgs()
+    n, precision, recall = model.test(valid_path)
+    metrics = {
+        "params": {"epoch": args.epoch, "lr": args.lr, "wordNgrams": args.wordNgrams, "dim": args.dim,
+                   "minn": args.minn, "maxn": args.maxn, "bucket": args.bucket},
+        "samples": n,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "train_seconds": train_seconds
+    }
+    with open(metrics_file, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    return metrics
+
+
+def search_best_model(data_path=DATA_PATH, model_path=MODEL_PATH, cache_dir=CACHE_DIR, search="grid",
+                      grid=None, valid_ratio=0.2, seed=42, jobs=None, threads=None, autotune_duration=300,
+                      refit=True):
+    """Подбирает параметры на воспроизводимом разбиении и сохраняет лучшую модель в model_path.
+
+    Каждая обученная конфигурация кэшируется по (хэш набора, разбиение, параметры),
+    поэтому при повторном запуске без изменений ничего не переобучается.
+    refit=True — лучшие параметры переобучаются на всём наборе (отложенная часть нужна
+    только для выбора); False — сохраняется модель, обученная на обучающей части.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_hash = dataset_hash(data_path)
+    split = {"valid_ratio": valid_ratio, "seed": seed}
+
+    split_dir = os.path.join(cache_dir, f"split-{cache_key(data_hash, split, {})}")
+    os.makedirs(split_dir, exist_ok=True)
+    train_path, valid_path = split_dataset(data_path, valid_ratio, seed, out_dir=split_dir)
+
+    cpus = os.cpu_count() or 1
+    refit_threads = threads or cpus
+    jobs = jobs or cpus
+    if search == "autotune":
+        configs = [{"autotune": autotune_duration}]
+        jobs = 1
+    elif search == "grid":
+        configs = list(grid_configs(grid or DEFAULT_GRID))
+    else:
+        configs = [dict(DEFAULT_SETTINGS)]
+    jobs = max(1, min(jobs, len(configs)))
+    # Ядра делим между процессами пула: thread — потоки FastText внутри одного обучения
+    threads = threads or max(1, cpus // jobs)
+
+    results, pending = [], []
+    for params in configs:
+        key = cache_key(data_hash, split, params)
+        model_file = os.path.join(cache_dir, f"{key}.bin")
+        metrics_file = os.path.join(cache_dir, f"{key}.json")
+        if os.path.exists(model_file) and os.path.exists(metrics_file):
+            with open(metrics_file, encoding="utf-8") as f:
+                results.append((json.load(f), model_file))
+        else:
+            pending.append((params, model_file, metrics_file))
+
+    print(f"Конфигураций: {len(configs)}, из кэша: {len(results)}, обучить: {len(pending)}")
+
+    if pending and search == "autotune":
+        # Автоподбор сам перебирает конфигурации, пул процессов ему не нужен
+        params, model_file, metrics_file = pending[0]
+        metrics = _autotune(train_path, valid_path, params["autotune"], threads, model_file, metrics_file)
+        results.append((metrics, model_file))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = []
+            for params, model_file, metrics_file in pending:
+                future = pool.submit(_train_config, train_path, valid_path, params,
+                                     threads, model_file, metrics_file)
+                futures.append((future, model_file))
+            for future, model_file in futures:
+                metrics = future.result()
+                print(f"  {metrics['params']} -> precision@1 {metrics['precision']:.3f}")
+                results.append((metrics, model_file))
+
+    best_metrics, best_file = max(results, key=lambda r: (r[0]["precision"], -r[0]["train_seconds"]))
+
+    if refit:
+        best_file = _refit_full(data_path, data_hash, best_metrics["params"], refit_threads, cache_dir)
+
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    shutil.copyfile(best_file, model_path)
+    metrics_path = os.path.splitext(model_path)[0] + ".metrics.json"
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        # Метрики — с отложенной выборки; refit_on_full — итоговая модель видела весь набор
+        json.dump(dict(best_metrics, dataset_sha256=data_hash, split=split, refit_on_full=refit),
+                  f, ensure_ascii=False, indent=2)
+
+    print(f"Лучшая модель: {best_metrics['params']}")
+    print(f"precision@1 {best_metrics['precision']:.3f}, recall@1 {best_metrics['recall']:.3f}, "
+          f"F1 {best_metrics['f1']:.3f} на {best_metrics['samples']} примерах")
+    print(f"Сохранена в {model_path}, метрики — {metrics_path}")
+    return best_metrics
+
+
+def _refit_full(data_path, data_hash, params, threads, cache_dir):
+    """Обучает лучшие параметры на всём наборе (тоже с кэшем); возвращает путь к модели"""
+    model_file = os.path.join(cache_dir, f"{cache_key(data_hash, {'full': True}, params)}.full.bin")
+    if os.path.exists(model_file):
+        print("Модель на всём наборе — из кэша")
+        return model_file
+    print("Обучение лучших параметров на всём наборе...")
+    settings = dict(DEFAULT_SETTINGS, **params)
+    model = fasttext.train_supervised(input=data_path, thread=threads, verbose=0, **settings)
+    model.save_model(model_file)
+    return model_file
+
+
 if __name__ == "__main__":
-    train_emotion_model()
+    parser = argparse.ArgumentParser(description="Обучение модели эмоций")
+    parser.add_argument("--data", default=DATA_PATH, help="размеченный набор в формате FastText")
+    parser.add_argument("--output", default=MODEL_PATH, help="куда сохранить итоговую модель")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="кэш обученных конфигураций")
+    parser.add_argument("--search", choices=["none", "grid", "autotune"], default="none",
+                        help="none — как раньше: весь набор с параметрами по умолчанию, grid — перебор сетки в пуле процессов, "
+                             "autotune — автоподбор FastText")
+    parser.add_argument("--grid", type=json.loads, default=None,
+                        help='сетка в JSON, например \'{"lr": [0.1, 0.5], "epoch": [25, 50]}\'')
+    parser.add_argument("--valid-ratio", type=float, default=0.2, help="доля отложенной выборки")
+    parser.add_argument("--seed", type=int, default=42, help="зерно разбиения")
+    parser.add_argument("--jobs", type=int, default=None, help="число процессов (по умолчанию — все ядра)")
+    parser.add_argument("--threads", type=int, default=None, help="потоков FastText на одно обучение")
+    parser.add_argument("--autotune-duration", type=int, default=300, help="секунд на автоподбор")
+    parser.add_argument("--full", action="store_true",
+                        help="обучить на всём наборе с параметрами по умолчанию (то же, что --search none)")
+    parser.add_argument("--no-refit", action="store_true",
+                        help="после перебора сохранить модель с обучающей части, не переобучая на всём наборе")
+    parser.add_argument("--quantize", action="store_true", help="дополнительно сохранить сжатую модель .ftz")
+    parser.add_argument("--cutoff", type=int, default=100000, help="размер словаря сжатой модели")
+    parser.add_argument("--no-retrain", action="store_true", help="не дообучать после отсечения словаря")
+    parser.add_argument("--compare", action="store_true",
+                        help="сравнить полную и сжатую модели на отложенной выборке")
+    args = parser.parse_args()
+
+    if args.compare:
+        # Модели сравнения — в кэш, а не поверх рабочей args.output
+        evaluate_quantization(args.data, os.path.join(args.cache_dir, "compare"), cutoff=args.cutoff,
+                              retrain=not args.no_retrain, threads=args.threads)
+    elif args.full or args.search == "none":
+        # Без перебора — как раньше: весь набор, параметры по умолчанию
+        train_emotion_model(args.data, args.output, quantize=args.quantize,
+                            cutoff=args.cutoff, retrain=not args.no_retrain, threads=args.threads)
+    else:
+        search_best_model(args.data, args.output, args.cache_dir, search=args.search, grid=args.grid,
+                          valid_ratio=args.valid_ratio, seed=args.seed, jobs=args.jobs,
+                          threads=args.threads, autotune_duration=args.autotune_duration,
+                          refit=not args.no_refit)
+        if args.quantize:
+            best = fasttext.load_model(args.output)
+            save_quantized(best, args.data, quantized_path(args.output),
+                           cutoff=args.cutoff, retrain=not args.no_retrain)
 
 # Загружаем предобученную модель
 #model = fasttext.load_model(r'D:\Software\Necessary\Dippploom\KOOOOD\MentalHealthApp\data\cc.ru.300.bin')
@@ -0,0 +1,159 @@
+# users.py - Дневники многих пользователей в одном процессе: общая модель, LRU по памяти
+import sys
+import threading
+from collections import OrderedDict
+
+from analyzer import EmotionAnalyzer
+
+# Сверх самой записи на каждую приходится: ссылка в списке записей, индекс по id,
+# колонки дата/эмоция/интенсивность в ReportAggregator и массивы EmotionTimeline
+# (замер tracemalloc в benchmark.py users: ~165 байт на запись)
+AGGREGATE_BYTES_PER_ENTRY = 168
+# Анализатор пользователя без записей: агрегаты, индекс, блокировки (~2 КБ по тому же замеру)
+SESSION_OVERHEAD_BYTES = 2048
+
+
+def _deep_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(item) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(item) for item in value)
+    return size
+
+
+def entry_size(entry):
+    """Объём записи в памяти: словарь со всеми строками и списками плюс её доля в агрегатах"""
+    return _deep_size(entry) + AGGREGATE_BYTES_PER_ENTRY
+
+
+class UserSession:
+    """Дневник одного пользователя в памяти: анализатор с его записями и агрегатами"""
+
+    def __init__(self, user_id, journal, analyzer):
+        self.user_id = user_id
+        self.journal = journal
+        self.analyzer = analyzer
+        self.size_bytes = SESSION_OVERHEAD_BYTES + sum(entry_size(entry) for entry in analyzer.entries)
+        # Запросы одного пользователя идут по очереди; выселение сессию не трогает —
+        # начатый запрос доработает, а следующий поднимет записи из хранилища заново
+        self.lock = threading.RLock()
+
+
+class UserSessions:
+    """Пользователи одного процесса: модель, паттерны и рекомендации загружены один раз.
+
+    Записи и агрегаты пользователя поднимаются из хранилища при первом обращении
+    и держатся в LRU; когда суммарная оценка памяти превышает memory_budget_mb,
+    выселяются дольше всего не использованные пользователи (их данные остаются
+    в хранилище). Так процесс обслуживает тысячи пользователей, держа в памяти
+    только активных.
+    """
+
+    def __init__(self, journal, model_path="model/emotion_model.bin", memory_budget_mb=256, shared=None):
+        """journal — repository.JournalRepository (дневники пользователей — через for_user);
+        shared — анализатор, чьи модель и справочники берут все пользователи"""
+        self.journal = journal
+        self.memory_budget = memory_budget_mb * 2 ** 20
+        self.shared = shared or EmotionAnalyzer(model_path)
+
+        self.memory_bytes = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, user_id):
+        """Сессия пользователя; при промахе записи читаются из хранилища"""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                self.hits += 1
+                self._sessions.move_to_end(user_id)
+                return session
+
+        # Чтение истории — вне общей блокировки, чтобы не задерживать других пользователей
+        session = self._load(user_id)
+        with self._lock:
+            current = self._sessions.get(user_id)
+            if current is not None:
+                # Пока читали, сессию поднял другой поток
+                return current
+            self.loads += 1
+            self._sessions[user_id] = session
+            self.memory_bytes += session.size_bytes
+            self._evict(keep=user_id)
+        return session
+
+    def _load(self, user_id):
+        journal = self.journal.for_user(user_id)
+        analyzer = EmotionAnalyzer(
+            model_loader=self.shared.model_loader,
+            risk_matcher=self.shared.risk_matcher,
+            recommendations=self.shared.recommendations,
+            prediction_cache=self.shared.prediction_cache
+        )
+        analyzer.load_entries(journal)
+        return UserSession(user_id, journal, analyzer)
+
+    def analyze(self, user_id, entry_data):
+        """Анализирует и сохраняет новую запись пользователя; возвращает (анализ, запись)"""
+        session = self.get(user_id)
+        with session.lock:
+            entry_data = dict(entry_data, id=session.journal.new_id())
+            analysis = session.analyzer.analyze_entry(entry_data, record=False)
+            if not analysis:
+                return None, None
+            new_entry = dict(entry_data, emotion=analysis.manifested_emotion, intensity=analysis.intensity,
+                             model_version=session.analyzer.model_loader.version)
+            session.journal.append(new_entry)
+            # В истории сессии — тот же словарь, что ушёл в хранилище
+            session.analyzer.record_entry(new_entry)
+        self._grow(session, entry_size(new_entry))
+        return analysis, new_entry
+
+    def report(self, user_id):
+        session = self.get(user_id)
+        with session.lock:
+            return session.analyzer.generate_long_term_report()
+
+    def evict(self, user_id):
+        with self._lock:
+            session = self._sessions.pop(user_id, None)
+            if session is not None:
+                self.memory_bytes -= session.size_bytes
+                self.evictions += 1
+
+    def _grow(self, session, size):
+        with self._lock:
+            session.size_bytes += size
+            if self._sessions.get(session.user_id) is session:
+                self.memory_bytes += size
+                self._evict(keep=session.user_id)
+
+    def _evict(self, keep=None):
+        """Выселяет холодных пользователей, пока оценка памяти выше бюджета"""
+        for user_id in list(self._sessions):
+            if self.memory_bytes <= self.memory_budget:
+                break
+            if user_id == keep:
+                continue
+            self.evict(user_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id):
+        return user_id in self._sessions
+
+    def stats(self):
+        requests = self.hits + self.loads
+        return {
+            "users_in_memory": len(self._sessions),
+            "memory_mb": self.memory_bytes / 2 ** 20,
+            "budget_mb": self.memory_budget / 2 ** 20,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
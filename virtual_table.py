@@ -0,0 +1,218 @@
+# virtual_table.py - Таблица, которая создаёт строки только для видимой области
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview с виртуальной прокруткой.
+
+    Таблица хранит только список ключей строк, сами записи берутся из внешнего
+    хранилища через get_entry(key). В Treeview живёт небольшой пул строк по размеру
+    окна: при прокрутке меняются их значения, а не добавляются новые элементы,
+    поэтому прокрутка и обновление не зависят от числа записей.
+    """
+
+    def __init__(self, parent, columns, headings, get_entry, format_row, buffer=2, **tree_options):
+        super().__init__(parent)
+        self.get_entry = get_entry
+        self.format_row = format_row  # entry -> (values, tags)
+        self.buffer = buffer
+
+        self.keys = []
+        self.offset = 0
+        self.visible_rows = 10
+        self.selected_key = None
+        self._pool = []
+        self._row_keys = {}  # iid строки пула -> ключ записи, показанной в ней
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', selectmode='browse', **tree_options)
+        for column, text in zip(columns, headings):
+            self.tree.heading(column, text=text)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_by(3))
+        self.tree.bind('<Up>', lambda e: self._move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self._move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self._move_selection(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self._move_selection(self.visible_rows))
+
+    # --- Данные ---
+
+    def set_keys(self, keys):
+        """Задаёт порядок строк; отрисовываются только строки в окне"""
+        self.keys = list(keys)
+        self._clamp_offset()
+        self.render()
+
+    def insert_key(self, index, key):
+        """Вставляет одну строку; перерисовка — только если она попадает в окно"""
+        self.keys.insert(index, key)
+        if index < self.offset:
+            # Строка выше окна: сдвигаем смещение, чтобы видимые записи остались на месте
+            self.offset += 1
+            self._update_scrollbar()
+        else:
+            self._render_if_visible(index)
+
+    def remove_key(self, key):
+        try:
+            index = self.keys.index(key)
+        except ValueError:
+            return
+        del self.keys[index]
+        if key == self.selected_key:
+            self.selected_key = None
+        if index < self.offset:
+            self.offset -= 1
+            self._update_scrollbar()
+        else:
+            self._clamp_offset()
+            self._render_if_visible(index)
+
+    def refresh_key(self, key):
+        """Перерисовывает строку, если запись с этим ключом сейчас на экране"""
+        if key in self._row_keys.values():
+            self.render()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def selected_entry(self):
+        if self.selected_key is None:
+            return None
+        return self.get_entry(self.selected_key)
+
+    def scroll_to(self, offset):
+        self.offset = offset
+        self._clamp_offset()
+        self.render()
+
+    def see(self, index):
+        """Прокручивает так, чтобы строка index была видна"""
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.visible_rows:
+            self.scroll_to(index - self.visible_rows + 1)
+
+    # --- Отрисовка ---
+
+    def render(self):
+        """Переписывает значения строк пула по текущему смещению"""
+        window = self.keys[self.offset:self.offset + self.visible_rows + self.buffer]
+        self._ensure_pool(len(window))
+
+        self._row_keys = {}
+        selected_iid = None
+        for position, iid in enumerate(self._pool):
+            if position < len(window):
+                key = window[position]
+                entry = self.get_entry(key)
+                values, tags = self.format_row(entry) if entry is not None else ((), ())
+                self.tree.item(iid, values=values, tags=tags)
+                self.tree.move(iid, '', position)
+                self._row_keys[iid] = key
+                if key == self.selected_key:
+                    selected_iid = iid
+            else:
+                self.tree.detach(iid)
+
+        current = self.tree.selection()
+        if selected_iid is None:
+            if current:
+                self.tree.selection_remove(current)
+        elif current != (selected_iid,):
+            self.tree.selection_set(selected_iid)
+            self.tree.focus(selected_iid)
+
+        # Собственную прокрутку Treeview не используем: пул всегда начинается сверху
+        self.tree.yview_moveto(0)
+        self._update_scrollbar()
+
+    def _render_if_visible(self, index):
+        if index < self.offset + self.visible_rows + self.buffer:
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def _ensure_pool(self, size):
+        while len(self._pool) < size:
+            self._pool.append(self.tree.insert('', 'end'))
+
+    def _update_scrollbar(self):
+        total = len(self.keys)
+        if not total:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        first = self.offset / total
+        last = min(1.0, (self.offset + self.visible_rows) / total)
+        self.scrollbar.set(first, last)
+
+    def _clamp_offset(self):
+        max_offset = max(0, len(self.keys) - self.visible_rows)
+        self.offset = max(0, min(self.offset, max_offset))
+
+    # --- События ---
+
+    def _on_resize(self, event):
+        row_height = self._row_height()
+        # Первая «строка» занята заголовком столбцов
+        rows = max(1, event.height // row_height - 1)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self._clamp_offset()
+            self.render()
+
+    def _row_height(self):
+        style = self.tree.cget('style') or 'Treeview'
+        try:
+            return int(ttk.Style().lookup(style, 'rowheight')) or 20
+        except (ValueError, tk.TclError):
+            return 20
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(value) * len(self.keys)))
+        elif action == 'scroll':
+            step = int(value) * (self.visible_rows if unit == 'pages' else 1)
+            self._scroll_by(step)
+
+    def _on_mousewheel(self, event):
+        # Windows/macOS: delta кратна 120 (или ±1 на macOS)
+        steps = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self._scroll_by(steps * 3)
+
+    def _scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+        return 'break'
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self._row_keys:
+            self.selected_key = self._row_keys[selection[0]]
+
+    def _move_selection(self, step):
+        """Стрелки и PageUp/PageDown: двигаем выделение по всем записям, а не по пулу"""
+        if not self.keys:
+            return 'break'
+        window = self.keys[self.offset:self.offset + len(self._row_keys)]
+        if self.selected_key in window:
+            index = self.offset + window.index(self.selected_key) + step
+        elif self.selected_key in self.keys:
+            index = self.keys.index(self.selected_key) + step
+        else:
+            index = self.offset
+        index = max(0, min(index, len(self.keys) - 1))
+        self.selected_key = self.keys[index]
+        self.see(index)
+        self.render()
+        self.tree.event_generate('<<TreeviewSelect>>')
+        return 'break'
@@ -0,0 +1,64 @@
+# workers.py - Фоновые задачи с возвратом результата в поток Tk
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundPipeline:
+    """Выполняет функции в рабочих потоках и отдаёт результаты в главный поток Tk.
+
+    Tkinter нельзя трогать из других потоков, поэтому результаты складываются в очередь,
+    а главный поток забирает их опросом через root.after, пока есть незавершённые задачи.
+    """
+
+    def __init__(self, root, max_workers=1, poll_ms=30):
+        self.root = root
+        self.poll_ms = poll_ms
+        # Один поток по умолчанию: анализ и сохранение записей идут строго по порядку
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._results = queue.Queue()
+        self._pending = 0
+        self._poll_job = None
+
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """Запускает func(*args) в фоне; on_done/on_error вызываются в главном потоке"""
+        self._pending += 1
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda f: self._results.put((f, on_done, on_error)))
+        if self._poll_job is None:
+            self._poll_job = self.root.after(self.poll_ms, self._poll)
+        return future
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def _poll(self):
+        self._poll_job = None
+        while True:
+            try:
+                future, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            error = future.exception()
+            try:
+                if error is not None:
+                    if on_error:
+                        on_error(error)
+                    else:
+                        print(f"Ошибка фоновой задачи: {error}")
+                elif on_done:
+                    on_done(future.result())
+            except Exception as e:
+                print(f"Ошибка обработки результата фоновой задачи: {e}")
+
+        if self._pending > 0:
+            self._poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self, wait=True):
+        """Останавливает пул. wait=True — сначала доделываются все поставленные задачи
+        (анализ и сохранение записей); wait=False — задачи в очереди отменяются"""
+        if self._poll_job is not None:
+            self.root.after_cancel(self._poll_job)
+            self._poll_job = None
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)